@@ -0,0 +1,15 @@
+from langchain.prompts import ChatPromptTemplate
+
+ON_TOPIC_MARKER = "[ON_TOPIC]"
+OFF_TOPIC_MARKER = "[OFF_TOPIC]"
+
+GradeAndAnswerPrompt = ChatPromptTemplate.from_template("""
+First decide whether the question is related to the topics of the context below.
+Start your reply with exactly one marker on its own line:
+[ON_TOPIC] if the question is related to the context, then answer it based only on the context.
+[OFF_TOPIC] if it is not related, and write nothing after the marker.
+
+Context: {context},
+chat history: {chat_history},
+Question: {question}
+""")
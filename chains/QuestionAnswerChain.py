@@ -0,0 +1,7 @@
+from langchain.prompts import ChatPromptTemplate
+
+QuestionAnswerPrompt = ChatPromptTemplate.from_template(""" 
+Answer the question based only on the following context: {context},
+chat history: {chat_history},
+Question: {question}
+""")
@@ -5,4 +5,6 @@ from .SummarizerGenChain import SummarizerGenPrompt
 from .SummarizerRewriterChain import SummarizerRewriterPrompt
 from .SummarizerMainPointChain import SummarizerMainPointPrompt
 from .GradeQuestionChain import GradeQuestionPrompt
+from .QuestionAnswerChain import QuestionAnswerPrompt
+from .GradeAndAnswerChain import GradeAndAnswerPrompt, ON_TOPIC_MARKER, OFF_TOPIC_MARKER
 from .schemes import *
\ No newline at end of file
@@ -23,5 +23,6 @@ class QuestionAnswerState(TypedDict):
     messages: list[BaseMessage]
     relevant_text: list[Document]
     on_topic: str
-    context: str
+    asset_id: str
+    asset_ids: list[str]
     conversation_history: list[BaseMessage]
\ No newline at end of file
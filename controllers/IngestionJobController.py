@@ -0,0 +1,393 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname( os.path.abspath(__file__))))
+
+import json
+import time
+import shutil
+import uuid
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from helper import get_settings
+from tools.pdf_extractor_tool import extract_pdf_to_file
+from tools.pdf_extractor_tool import EXTRACTOR_VERSION as PDF_EXTRACTOR_VERSION
+from tools.transcript_tool import transcription_pool, TranscriptionQueueFull, stitch_windows
+from tools.transcript_tool import EXTRACTOR_VERSION as MEDIA_EXTRACTOR_VERSION
+from tools.text_index_tool import write_segments_text, save_text_index, load_text_index, append_text, truncate_text
+from tools.vector_index_tool import ASSETS_BASE_PATH, update_asset_index, set_ingesting
+
+config = get_settings()
+
+JOBS_DIR = os.path.join(ASSETS_BASE_PATH, ".jobs")
+UPLOADS_DIR = os.path.join(ASSETS_BASE_PATH, ".uploads")
+CONTENT_INDEX_PATH = os.path.join(ASSETS_BASE_PATH, ".content_index.json")
+TERMINAL_STATUSES = ("completed", "failed")
+
+def _write_json(path: str, data: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path) # atomic, a crash never leaves a half written job file
+
+class IngestionJobManager:
+    """
+    Runs asset ingestion (extraction/transcription then indexing) as background jobs.
+    Job state is persisted under assets/.jobs so unfinished jobs resume after a restart,
+    skipping the extraction stage when it had already completed.
+    """
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._jobs: Dict[str, dict] = {}
+        self._content_index: Dict[str, dict] = None
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        os.makedirs(UPLOADS_DIR, exist_ok=True)
+        self._load_content_index()
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        for file_name in sorted(os.listdir(JOBS_DIR)):
+            if not file_name.endswith(".json"):
+                continue
+            job = self.get(file_name[:-len(".json")])
+            if job and job["status"] not in TERMINAL_STATUSES:
+                print(f"Resuming ingestion job {job['job_id']} at stage '{job['stage']}'")
+                self._queue.put_nowait(job["job_id"])
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit_upload(
+        self,
+        upload_path: str,
+        filename: str,
+        content_hash: str,
+        file_kind: str,
+        chunked: bool = False
+    ):
+        """
+        Turns a hashed upload into an asset and queues its ingestion job.
+        When an asset with the same content hash and extractor version exists (finished or still
+        processing) the upload is discarded and that asset's job is returned instead.
+        Returns (job, deduplicated).
+        """
+        content_key = f"{content_hash}:{self._extractor_version(file_kind)}"
+        existing = self._find_content(content_key)
+        if existing is not None:
+            os.remove(upload_path)
+            print(f"Duplicate upload of {filename}, reusing asset {existing['asset_id']}")
+            return existing, True
+
+        asset_id = str(uuid.uuid4())
+        asset_dir = os.path.join(ASSETS_BASE_PATH, asset_id)
+        os.makedirs(asset_dir, exist_ok=True)
+        file_path = os.path.join(asset_dir, filename)
+        os.replace(upload_path, file_path)
+        _write_json(os.path.join(asset_dir, "asset.json"), {
+            "asset_id": asset_id,
+            "filename": filename,
+            "content_hash": content_hash,
+            "extractor_version": self._extractor_version(file_kind),
+            "size": os.path.getsize(file_path),
+        })
+
+        job = self.create_job(asset_id, file_path, file_kind, chunked)
+        self._content_index[content_key] = {"asset_id": asset_id, "job_id": job["job_id"]}
+        _write_json(CONTENT_INDEX_PATH, self._content_index)
+        return job, False
+
+    def create_job(
+        self,
+        asset_id: str,
+        file_path: str,
+        file_kind: str,
+        chunked: bool = False,
+        mode: str = "ingest"
+    ) -> dict:
+        """mode is "ingest" (a new asset), "reextract" (new text for an asset) or "append" (text added to an asset)."""
+        now = time.time()
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "asset_id": asset_id,
+            "file_path": file_path,
+            "file_kind": file_kind,
+            "chunked": chunked,
+            "mode": mode,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0.0,
+            "error": None,
+            "result": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self._jobs[job["job_id"]] = job
+        _write_json(self._job_path(job["job_id"]), job)
+        self._queue.put_nowait(job["job_id"])
+        return job
+
+    def submit_reextract(self, asset_id: str) -> dict:
+        """
+        Queues re-extraction of an asset's original file with the current extractor, followed by an
+        incremental reindex that only embeds the chunks whose text changed.
+        """
+        asset_dir = os.path.join(ASSETS_BASE_PATH, asset_id)
+        with open(os.path.join(asset_dir, "asset.json"), "r", encoding="utf-8") as f:
+            asset = json.load(f)
+        file_path = os.path.join(asset_dir, asset["filename"])
+        file_kind = "pdf" if file_path.lower().endswith(".pdf") else "media"
+
+        job = self.create_job(asset_id, file_path, file_kind, mode="reextract")
+        content_key = f"{asset['content_hash']}:{self._extractor_version(file_kind)}"
+        self._content_index[content_key] = {"asset_id": asset_id, "job_id": job["job_id"]}
+        _write_json(CONTENT_INDEX_PATH, self._content_index)
+        _write_json(os.path.join(asset_dir, "asset.json"), {**asset, "extractor_version": self._extractor_version(file_kind)})
+        return job
+
+    def submit_append(
+        self,
+        asset_id: str,
+        upload_path: str,
+        filename: str,
+        file_kind: str,
+        chunked: bool = False
+    ) -> dict:
+        """
+        Queues extraction of an upload (e.g. the next lecture of a series) whose text is appended to an
+        existing asset, followed by an incremental reindex that only embeds the new chunks.
+        """
+        asset_dir = os.path.join(ASSETS_BASE_PATH, asset_id)
+        file_path = os.path.join(asset_dir, f"{uuid.uuid4().hex[:8]}_{filename}")
+        os.replace(upload_path, file_path)
+
+        asset_path = os.path.join(asset_dir, "asset.json")
+        with open(asset_path, "r", encoding="utf-8") as f:
+            asset = json.load(f)
+        asset["appended_files"] = asset.get("appended_files", []) + [os.path.basename(file_path)]
+        _write_json(asset_path, asset)
+        return self.create_job(asset_id, file_path, file_kind, chunked, mode="append")
+
+    def _discard_appended_file(self, file_path: str):
+        asset_path = os.path.join(os.path.dirname(file_path), "asset.json")
+        with open(asset_path, "r", encoding="utf-8") as f:
+            asset = json.load(f)
+        asset["appended_files"] = [name for name in asset.get("appended_files", []) if name != os.path.basename(file_path)]
+        _write_json(asset_path, asset)
+        for path in (file_path, f"{file_path}.extracted.txt"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            path = self._job_path(job_id)
+            if not os.path.exists(path):
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                job = json.load(f)
+            self._jobs[job_id] = job
+        return job
+
+    def active_job(self, asset_id: str) -> Optional[dict]:
+        """An unfinished job of the asset, if any. Jobs of one asset must not run concurrently."""
+        for job in self._jobs.values():
+            if job["asset_id"] == asset_id and job["status"] not in TERMINAL_STATUSES:
+                return job
+        return None
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Registers a listener for the job's events. Call before awaiting anything to miss none."""
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id, [])
+        if queue in subscribers:
+            subscribers.remove(queue)
+        if not subscribers:
+            self._subscribers.pop(job_id, None)
+
+    async def stream(self, job_id: str, queue: asyncio.Queue = None) -> AsyncIterator[dict]:
+        """Yields a status snapshot followed by live events until the job completes or fails."""
+        queue = queue or self.subscribe(job_id)
+        try:
+            job = self.get(job_id)
+            yield {"type": "status", **self._public(job)}
+            if job["status"] in TERMINAL_STATUSES:
+                return
+            while True:
+                event = await queue.get()
+                yield event
+                if event["type"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            self.unsubscribe(job_id, queue)
+
+    def _extractor_version(self, file_kind: str) -> str:
+        return PDF_EXTRACTOR_VERSION if file_kind == "pdf" else MEDIA_EXTRACTOR_VERSION
+
+    def _load_content_index(self) -> Dict[str, dict]:
+        if self._content_index is None:
+            self._content_index = {}
+            if os.path.exists(CONTENT_INDEX_PATH):
+                with open(CONTENT_INDEX_PATH, "r", encoding="utf-8") as f:
+                    self._content_index = json.load(f)
+        return self._content_index
+
+    def _find_content(self, content_key: str) -> Optional[dict]:
+        entry = self._load_content_index().get(content_key)
+        if entry is None:
+            return None
+        job = self.get(entry["job_id"])
+        if job is None or job["status"] == "failed" or not os.path.isdir(os.path.join(ASSETS_BASE_PATH, entry["asset_id"])):
+            self._forget_content(entry["job_id"])
+            return None
+        return job
+
+    def _forget_content(self, job_id: str):
+        index = self._load_content_index()
+        stale = [key for key, entry in index.items() if entry["job_id"] == job_id]
+        for key in stale:
+            del index[key]
+        if stale:
+            _write_json(CONTENT_INDEX_PATH, index)
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+    def _public(self, job: dict) -> dict:
+        return {key: value for key, value in job.items() if key != "file_path"}
+
+    def _publish(self, job_id: str, event: dict):
+        for queue in self._subscribers.get(job_id, []):
+            queue.put_nowait(event)
+
+    def _update(self, job: dict, **fields):
+        job.update(fields, updated_at=time.time())
+        _write_json(self._job_path(job["job_id"]), job)
+        self._publish(job["job_id"], {"type": "progress", "stage": job["stage"], "progress": job["progress"]})
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self.get(job_id)
+            set_ingesting(job["asset_id"], True)
+            try:
+                await self._run(job)
+            except Exception as e:
+                print(f"ERROR: Ingestion job {job_id} failed: {str(e)}")
+                asset_dir = os.path.dirname(job["file_path"])
+                if job.get("mode", "ingest") == "ingest" and os.path.exists(asset_dir): # Clean up the asset directory like a failed upload
+                    shutil.rmtree(asset_dir)
+                elif job.get("mode") == "append": # the asset keeps its text, only the appended file is dropped
+                    self._discard_appended_file(job["file_path"])
+                self._forget_content(job_id)
+                self._update(job, status="failed", error=str(e))
+                self._publish(job_id, {"type": "failed", "error": str(e)})
+            finally:
+                set_ingesting(job["asset_id"], False)
+                self._queue.task_done()
+
+    async def _run(self, job: dict):
+        asset_dir = os.path.dirname(job["file_path"])
+        text_path = os.path.join(asset_dir, "extracted_text.txt")
+        self._update(job, status="running")
+
+        if job["stage"] in ("queued", "extracting"):
+            self._update(job, stage="extracting", progress=0.0)
+            if job.get("mode") == "append":
+                await self._extract_and_append(job, job["file_path"])
+            else:
+                unit, offsets = await self._extract(job, job["file_path"], text_path)
+                save_text_index(asset_dir, unit, offsets)
+                if job.get("mode") == "reextract": # files appended to the asset are re-extracted too
+                    with open(os.path.join(asset_dir, "asset.json"), "r", encoding="utf-8") as f:
+                        appended_files = json.load(f).get("appended_files", [])
+                    for file_name in appended_files:
+                        await self._extract_and_append(job, os.path.join(asset_dir, file_name))
+
+        self._update(job, stage="indexing", progress=0.8)
+        print(f"Updating vector index for asset: {job['asset_id']}")
+        index_path = await run_in_threadpool(update_asset_index, job["asset_id"])
+        print("Vector index build complete")
+
+        result = {
+            "message": "File processed successfully",
+            "id": job["asset_id"],
+            "text_path": text_path,
+            "original_file_path": job["file_path"],
+            "index_path": index_path
+        }
+        self._update(job, status="completed", stage="done", progress=1.0, result=result)
+        self._publish(job["job_id"], {"type": "completed", "result": result})
+
+    async def _extract(self, job: dict, file_path: str, output_path: str):
+        """Extracts a PDF or transcribes a media file into output_path. Returns (unit, offsets)."""
+        if job["file_kind"] == "pdf":
+            print(f"Processing as PDF: {file_path}")
+            loop = asyncio.get_running_loop()
+            def on_progress(done_pages: int, page_count: int): # called from the extraction thread
+                loop.call_soon_threadsafe(
+                    lambda: self._update(job, progress=round(0.8 * done_pages / page_count, 3))
+                )
+            offsets = await run_in_threadpool(extract_pdf_to_file, file_path, output_path, on_progress=on_progress)
+            print("PDF text extraction complete")
+            return "page", offsets
+
+        print(f"Processing as audio/video: {file_path}")
+        transcription = await self._transcribe(job, file_path)
+        offsets = await run_in_threadpool(write_segments_text, transcription["segments"], output_path)
+        print("Audio/Video transcription complete")
+        return "segment", offsets
+
+    async def _extract_and_append(self, job: dict, file_path: str):
+        """
+        Extracts file_path and appends its text to the asset. An append job first persists the asset's
+        text size and unit count; when it resumes after a restart that interrupted or followed the
+        append, the asset is cut back to them, so the text is never appended twice.
+        """
+        asset_dir = os.path.dirname(job["file_path"])
+        text_path = os.path.join(asset_dir, "extracted_text.txt")
+        extract_path = f"{file_path}.extracted.txt"
+        unit, offsets = await self._extract(job, file_path, extract_path)
+
+        if job.get("mode") == "append":
+            base = job.get("append_base")
+            if base is None:
+                index = load_text_index(asset_dir)
+                base = {"size": os.path.getsize(text_path), "count": index["count"] if index else 0}
+                self._update(job, append_base=base)
+            elif os.path.getsize(text_path) != base["size"]:
+                print(f"Rolling back an interrupted append to asset {job['asset_id']}")
+                await run_in_threadpool(truncate_text, asset_dir, base["size"], base["count"])
+        await run_in_threadpool(append_text, asset_dir, extract_path, unit, offsets)
+
+    async def _transcribe(self, job: dict, file_path: str) -> dict:
+        while True:
+            try:
+                if not (job["chunked"] or config.TRANSCRIPTION_CHUNKED):
+                    return await transcription_pool.transcribe(file_path)
+
+                windows = []
+                async for window in transcription_pool.transcribe_windows(file_path):
+                    windows.append(window)
+                    partial = {key: window[key] for key in ("index", "count", "start", "end", "text")}
+                    self._publish(job["job_id"], {"type": "partial_transcript", **partial})
+                    self._update(job, progress=round(0.8 * len(windows) / window["count"], 3))
+                return stitch_windows(windows)
+
+            except TranscriptionQueueFull: # the job queue is the backlog, wait for a free worker slot
+                await asyncio.sleep(1.0)
+
+ingestion_manager = IngestionJobManager(workers=config.INGEST_WORKERS)
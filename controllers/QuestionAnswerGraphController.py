@@ -2,59 +2,239 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname( os.path.abspath(__file__))))
 
-from helper import get_settings, text_splitter
-from llm import LLMProviderFactory, EmbeddingProviderFactory
-
-from chains import GradeQuestion, GradeQuestionPrompt
+from helper import get_settings
+from llm import LLMProviderFactory
+from tools.vector_index_tool import load_course_retriever, get_query_embedding, get_asset_dir
+from tools.topic_profile_tool import load_topic_profile, topic_gate
+from tools.parent_chunk_tool import expand_to_parents
+
+from chains import GradeQuestion, GradeQuestionPrompt, QuestionAnswerPrompt
+from chains import GradeAndAnswerPrompt, ON_TOPIC_MARKER, OFF_TOPIC_MARKER
 from .GraphState import QuestionAnswerState
 
-from langchain_community.vectorstores import Chroma
+import asyncio
+from contextlib import aclosing
+
+from langchain_core.callbacks.manager import adispatch_custom_event
 from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.prompts import ChatPromptTemplate
 
 config = get_settings()
 
-def question_classifier(state: QuestionAnswerState) -> QuestionAnswerState: 
-    if hasattr(state["messages"][-1], 'content'):
-        question = state["messages"][-1].content
-    else:    
-        question = state["messages"][-1]["content"]
+BUFFERED_ANSWER_TAG = "buffered_answer" # answer runs whose tokens are released as ANSWER_TOKEN_EVENT instead
+ANSWER_TOKEN_EVENT = "answer_token"
+PREAMBLE_MAX_CHARS = 32 # replies without a marker in this many characters are treated as on-topic answers
 
-    if "conversation_history" not in state:
-        state["conversation_history"] = []
+def _last_question(state: QuestionAnswerState) -> str:
+    if hasattr(state["messages"][-1], 'content'):
+        return state["messages"][-1].content
+    return state["messages"][-1]["content"]
+
+def _asset_ids(state: QuestionAnswerState) -> list:
+    """The assets a session asks about: the course's asset_ids, or its single asset_id."""
+    return state.get("asset_ids") or [state["asset_id"]]
+
+def _retrieve_relevant_text(state: QuestionAnswerState, question: str):
+    retriever = load_course_retriever(_asset_ids(state), k=config.RERANK_TOP_K if config.RERANK_ENABLED else 5)
+    return retriever.invoke(question) if retriever else []
+
+def _answer_context(state: QuestionAnswerState):
+    """The retrieved chunks widened to their deduplicated parent spans, within QA_CONTEXT_MAX_TOKENS."""
+    if not config.PARENT_CHUNK_ENABLED:
+        return state["relevant_text"]
+    return expand_to_parents(
+        state["relevant_text"],
+        config.QA_CONTEXT_MAX_TOKENS,
+        lambda doc: get_asset_dir(doc.metadata.get("asset_id", state["asset_id"]))
+    )
 
-    embedding = EmbeddingProviderFactory(config).create(config.EMBEDDING_MODEL_PROVIDER)
+def _topic_gate_decision(state: QuestionAnswerState, question: str):
+    """
+    "yes"/"no" when the topic profiles decide the question locally, None when the grader LLM must.
+    For a course the question is on-topic when any asset accepts it and off-topic when all reject it.
+    """
+    if not config.TOPIC_GATE_ENABLED:
+        return None
+    profiles = [load_topic_profile(get_asset_dir(asset_id)) for asset_id in _asset_ids(state)]
+    if not profiles or any(profile is None for profile in profiles):
+        return None
+    query_vector = get_query_embedding().embed_query(question)
+    decisions = [topic_gate(profile, query_vector, config.TOPIC_GATE_LOW, config.TOPIC_GATE_HIGH)[0] for profile in profiles]
+    if "yes" in decisions:
+        return "yes"
+    if all(decision == "no" for decision in decisions):
+        return "no"
+    return None
+
+def _grader_chain():
+    return LLMProviderFactory(config).create_chain(
+        GradeQuestionPrompt,
+        config.GRADE_QA_PROVIDER, 
+        config.GRADE_QA_MODEL_ID, 
+        config.GRADE_QA_TEMPERATURE,
+        output_schema=GradeQuestion
+    )
 
-    texts = text_splitter(
-        state["context"], 
-        chunk_size=int(os.getenv("CHUNK_SIZE", 350)), 
-        chunk_overlap=int(os.getenv("CHUNK_OVERLAP", 50))
+def _answer_chain(prompt=QuestionAnswerPrompt):
+    return LLMProviderFactory(config).create_chain(
+        prompt,
+        config.QUESTION_ANSWERER_PROVIDER, 
+        config.QUESTION_ANSWERER_MODEL_ID, 
+        config.QUESTION_ANSWERER_TEMPERATURE
     )
 
-    retriever = Chroma.from_texts(
-        texts, 
-        embedding, 
-    ).as_retriever(search_type="mmr", search_kwargs={"k": 5})
+def question_classifier(state: QuestionAnswerState) -> QuestionAnswerState: 
+    question = _last_question(state)
 
-    state["relevant_text"] = retriever.invoke(question) 
+    if "conversation_history" not in state:
+        state["conversation_history"] = []
 
-    docs = "\n".join([doc.page_content for doc in state["relevant_text"]])
-    llm = LLMProviderFactory(config).create(
-        config.GRADE_QA_PROVIDER, 
-        config.GRADE_QA_MODEL_ID, 
-        config.GRADE_QA_TEMPERATURE
-    )
+    state["relevant_text"] = _retrieve_relevant_text(state, question)
 
-    structured_llm = llm.with_structured_output(GradeQuestion)
-    grader_llm = GradeQuestionPrompt | structured_llm
-    result = grader_llm.invoke({"question": question, "docs": docs})
+    decision = _topic_gate_decision(state, question) # clearly on/off-topic questions skip the grader LLM
+    if decision is not None:
+        state["on_topic"] = decision
+        return state
+
+    docs = "\n".join([doc.page_content for doc in state["relevant_text"]])
+    result = _grader_chain().invoke({"question": question, "docs": docs})
     
     state["on_topic"] = result.score
 
     return state
 
+async def speculative_answer(state: QuestionAnswerState, config: RunnableConfig):
+    """
+    Speculative variant of question_classifier + generate_answer_streaming: the answer is generated
+    while the grader runs. Its tokens are buffered and released as ANSWER_TOKEN_EVENT custom events once
+    the grade is "Yes"; on "No" the generation is cancelled and the graph routes to the off-topic response.
+    The answer run is tagged BUFFERED_ANSWER_TAG so its raw model stream events can be ignored by consumers.
+    config is the run config injected by LangGraph (it shadows the settings inside this node).
+    """
+    question = _last_question(state)
+
+    if "conversation_history" not in state:
+        state["conversation_history"] = []
+
+    state["relevant_text"] = await asyncio.to_thread(_retrieve_relevant_text, state, question)
+    decision = await asyncio.to_thread(_topic_gate_decision, state, question)
+
+    tokens: asyncio.Queue = asyncio.Queue()
+    answer_inputs = {"context": _answer_context(state), "chat_history": state["conversation_history"], "question": question}
+
+    async def generate():
+        try:
+            async for chunk in _answer_chain().with_config(tags=[BUFFERED_ANSWER_TAG]).astream(answer_inputs):
+                if hasattr(chunk, 'content') and chunk.content:
+                    await tokens.put(chunk.content)
+        finally:
+            await tokens.put(None)
+
+    answer_task = None
+    if decision is None:
+        answer_task = asyncio.create_task(generate())
+        try:
+            docs = "\n".join([doc.page_content for doc in state["relevant_text"]])
+            decision = (await _grader_chain().ainvoke({"question": question, "docs": docs})).score
+        except BaseException:
+            answer_task.cancel()
+            raise
+
+    state["on_topic"] = decision
+    if decision.lower() != "yes":
+        if answer_task is not None:
+            answer_task.cancel()
+        return state
+
+    if answer_task is None:
+        answer_task = asyncio.create_task(generate())
+
+    full_response = ""
+    while (token := await tokens.get()) is not None:
+        full_response += token
+        await adispatch_custom_event(ANSWER_TOKEN_EVENT, {"content": token}, config=config)
+
+    try:
+        await answer_task
+    except Exception as e:
+        print(f"Error in streaming: {e}")
+
+    state["messages"].append(AIMessage(content=full_response))
+    state["conversation_history"] = state["conversation_history"] + [state["messages"][-2], state["messages"][-1]]
+    return state
+
+def parse_preamble(text: str):
+    """
+    Reads the relevance marker at the start of a single-call reply.
+    Returns ("yes"|"no", remaining text) once decided, or (None, text) while more text is needed.
+    """
+    stripped = text.lstrip()
+    for marker, decision in ((ON_TOPIC_MARKER, "yes"), (OFF_TOPIC_MARKER, "no")):
+        if stripped.startswith(marker):
+            return decision, stripped[len(marker):].lstrip("\n")
+        if marker.startswith(stripped):
+            return None, text # marker still arriving
+    if len(stripped) >= PREAMBLE_MAX_CHARS or not stripped.startswith("["):
+        return "yes", text # no marker, treat the reply as an answer
+    return None, text
+
+async def grade_and_answer(state: QuestionAnswerState, config: RunnableConfig):
+    """
+    Single-call variant of question_classifier + generate_answer_streaming: one model call starts its
+    reply with an [ON_TOPIC]/[OFF_TOPIC] marker and then answers. The marker is read from the first
+    streamed chunks; the answer tokens after it are released as ANSWER_TOKEN_EVENT custom events and an
+    off-topic reply is cut off right after its marker.
+    config is the run config injected by LangGraph (it shadows the settings inside this node).
+    """
+    question = _last_question(state)
+
+    if "conversation_history" not in state:
+        state["conversation_history"] = []
+
+    state["relevant_text"] = await asyncio.to_thread(_retrieve_relevant_text, state, question)
+    if await asyncio.to_thread(_topic_gate_decision, state, question) == "no":
+        state["on_topic"] = "no"
+        return state
+
+    inputs = {"context": _answer_context(state), "chat_history": state["conversation_history"], "question": question}
+    decision, buffered, full_response = None, "", ""
+    stream = _answer_chain(GradeAndAnswerPrompt).with_config(tags=[BUFFERED_ANSWER_TAG]).astream(inputs)
+    try:
+        async with aclosing(stream): # leaving the loop early closes the stream and cancels the generation
+            async for chunk in stream:
+                if not (hasattr(chunk, 'content') and chunk.content):
+                    continue
+                token = chunk.content
+                if decision is None:
+                    decision, token = parse_preamble(buffered + token)
+                    buffered = token if decision is None else ""
+                    if decision == "no":
+                        break
+                    if decision is None:
+                        continue
+                if not full_response: # drop the line break after the marker
+                    token = token.lstrip()
+                    if not token:
+                        continue
+                full_response += token
+                await adispatch_custom_event(ANSWER_TOKEN_EVENT, {"content": token}, config=config)
+    except Exception as e:
+        print(f"Error in streaming: {e}")
+
+    state["on_topic"] = decision or "yes"
+    if state["on_topic"] == "no":
+        return state
+
+    if buffered: # the reply ended before a marker was complete
+        full_response += buffered
+        await adispatch_custom_event(ANSWER_TOKEN_EVENT, {"content": buffered}, config=config)
+
+    state["messages"].append(AIMessage(content=full_response))
+    state["conversation_history"] = state["conversation_history"] + [state["messages"][-2], state["messages"][-1]]
+    return state
+
 def on_topic_router(state: QuestionAnswerState): 
     on_topic = state["on_topic"]
     if on_topic.lower() == "yes":
@@ -70,7 +250,7 @@ def generate_answer(state: QuestionAnswerState):
         question = state["messages"][-1].content
     else:    
         question = state["messages"][-1]["content"]
-    documents = state["relevant_text"] 
+    documents = _answer_context(state)
 
     if "conversation_history" not in state:
         state["conversation_history"] = []
@@ -78,20 +258,7 @@ def generate_answer(state: QuestionAnswerState):
     # Use conversation history for better context
     chat_history = state.get("conversation_history", [])
 
-    template = """ 
-Answer the question based only on the following context: {context},
-chat history: {chat_history},
-Question: {question}
-"""
-
-    prompt = ChatPromptTemplate.from_template(template)
-    llm = LLMProviderFactory(config).create(
-        config.QUESTION_ANSWERER_PROVIDER, 
-        config.QUESTION_ANSWERER_MODEL_ID, 
-        config.QUESTION_ANSWERER_TEMPERATURE
-    )
-
-    rag_chain = prompt | llm
+    rag_chain = _answer_chain()
 
     generation =  rag_chain.invoke({"context": documents, "chat_history": chat_history, "question": question})
     state["messages"].append(generation)
@@ -105,7 +272,7 @@ Question: {question}
 
 async def generate_answer_streaming(state: QuestionAnswerState): 
     question = state["messages"][-1].content
-    documents = state["relevant_text"] 
+    documents = _answer_context(state)
     
     if "conversation_history" not in state:
         state["conversation_history"] = []
@@ -113,20 +280,7 @@ async def generate_answer_streaming(state: QuestionAnswerState):
     # Use conversation history for better context
     chat_history = state.get("conversation_history", [])
 
-    template = """ 
-Answer the question based only on the following context: {context},
-chat history: {chat_history},
-Question: {question}
-"""
-
-    prompt = ChatPromptTemplate.from_template(template)
-    llm = LLMProviderFactory(config).create(
-        config.QUESTION_ANSWERER_PROVIDER, 
-        config.QUESTION_ANSWERER_MODEL_ID, 
-        config.QUESTION_ANSWERER_TEMPERATURE
-    )
-
-    rag_chain = prompt | llm
+    rag_chain = _answer_chain()
     
     full_response = ""
     
@@ -169,29 +323,50 @@ async def off_topic_response_streaming(state: QuestionAnswerState):
     yield state
 
 
-stream_graph = StateGraph(QuestionAnswerState)
-
-stream_graph.add_node("topic_decision", question_classifier)
-stream_graph.add_node("off_topic_response", off_topic_response_streaming)
-stream_graph.add_node("retrieve", retrieve)
-stream_graph.add_node("generate_answer_streaming", generate_answer_streaming)
-
-stream_graph.add_conditional_edges(
-    "topic_decision", 
-    on_topic_router, 
-    {
-        "on_topic": "retrieve", 
-        "off_topic": "off_topic_response"
-    }
-)
+def build_stream_qa_graph(mode: str = "two_stage", checkpointer=None):
+    """
+    Builds the streaming QA graph for a QA_GRAPH_MODE:
+    "two_stage" grades then answers, "speculative" answers while grading and
+    "single_call" grades and answers in one model call.
+    """
+    stream_graph = StateGraph(QuestionAnswerState)
+    stream_graph.add_node("off_topic_response", off_topic_response_streaming)
+    stream_graph.add_edge("off_topic_response", END)
+
+    if mode in ("single_call", "speculative"):
+        node = grade_and_answer if mode == "single_call" else speculative_answer
+        stream_graph.add_node(node.__name__, node)
+        stream_graph.add_conditional_edges(
+            node.__name__,
+            on_topic_router,
+            {
+                "on_topic": END,
+                "off_topic": "off_topic_response"
+            }
+        )
+        stream_graph.add_edge(START, node.__name__)
+        return stream_graph.compile(checkpointer=checkpointer)
+
+    stream_graph.add_node("topic_decision", question_classifier)
+    stream_graph.add_node("retrieve", retrieve)
+    stream_graph.add_node("generate_answer_streaming", generate_answer_streaming)
+
+    stream_graph.add_conditional_edges(
+        "topic_decision", 
+        on_topic_router, 
+        {
+            "on_topic": "retrieve", 
+            "off_topic": "off_topic_response"
+        }
+    )
 
-stream_graph.add_edge("retrieve", "generate_answer_streaming")
-stream_graph.add_edge("generate_answer_streaming", END)
-stream_graph.add_edge("off_topic_response", END)
-stream_graph.add_edge(START, "topic_decision")
+    stream_graph.add_edge("retrieve", "generate_answer_streaming")
+    stream_graph.add_edge("generate_answer_streaming", END)
+    stream_graph.add_edge(START, "topic_decision")
+    return stream_graph.compile(checkpointer=checkpointer)
 
 checkpointer = MemorySaver()
-stream_qa_graph = stream_graph.compile(checkpointer=checkpointer)
+stream_qa_graph = build_stream_qa_graph(config.QA_GRAPH_MODE, checkpointer)
 
 qa_graph = StateGraph(QuestionAnswerState)
 
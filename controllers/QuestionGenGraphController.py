@@ -17,14 +17,13 @@ config = get_settings()
 
 def QuestionGenerator(state: QuestionGenState) -> QuestionGenState:
 
-    llm = LLMProviderFactory(config).create(
-        config.QUESTION_GENERATER_PROVIDER, 
-        config.QUESTION_GENERATER_MODEL_ID, 
-        config.QUESTION_GENERATER_TEMPERATURE
+    question_generation_llm = LLMProviderFactory(config).create_chain(
+        QuestionGenPrompt,
+        config.QUESTION_GENERATER_PROVIDER,
+        config.QUESTION_GENERATER_MODEL_ID,
+        config.QUESTION_GENERATER_TEMPERATURE,
+        output_schema=Question
     )
-
-    llm = llm.with_structured_output(Question)
-    question_generation_llm = QuestionGenPrompt | llm
     response = question_generation_llm.invoke({"context": state["context"], "question_type": state["question_type"]})
 
     state["question"] = response.question
@@ -63,14 +62,13 @@ def Router(state: QuestionGenState) -> str:
     
 def QuestionRefiner(state: QuestionGenState) -> QuestionGenState:
 
-    llm = LLMProviderFactory(config).create(
+    question_refiner_llm = LLMProviderFactory(config).create_chain(
+        QuestionRefinerPrompt,
         config.QUESTION_REFINER_PROVIDER,
         config.QUESTION_REFINER_MODEL_ID,
-        config.QUESTION_REFINER_TEMPERATURE
+        config.QUESTION_REFINER_TEMPERATURE,
+        output_schema=Feedback
     )
-
-    llm = llm.with_structured_output(Feedback)
-    question_refiner_llm = QuestionRefinerPrompt | llm
     response = question_refiner_llm.invoke({"context": state["context"], "question_type": state["question_type"], "question": state["question"], "options": state["options"], "answer": state["answer"], "explanation": state["explanation"]})
 
     state["feedback"] = response.feedback
@@ -78,15 +76,14 @@ def QuestionRefiner(state: QuestionGenState) -> QuestionGenState:
 
 def QuestionRewriter(state: QuestionGenState) -> QuestionGenState:
 
-    llm = LLMProviderFactory(config).create(
+    question_rewriter_llm = LLMProviderFactory(config).create_chain(
+        QuestionRewriterPrompt,
         config.QUESTION_REWRITER_PROVIDER,
         config.QUESTION_REWRITER_MODEL_ID,
-        config.QUESTION_REWRITER_TEMPERATURE
+        config.QUESTION_REWRITER_TEMPERATURE,
+        output_schema=Question
     )
 
-    llm = llm.with_structured_output(Question)
-    question_rewriter_llm = QuestionRewriterPrompt | llm
-
     GeneratedQuestionFormat = """Question_Type: {Question_Type}, Transcript: {Context}, Question: {Question}\nOptions: {Options}\nAnswer: {Answer}\nExplanation: {Explanation}"""
     NewQuestionFormat = """Question_Type: {Question_Type}, Question: {Question}\nOptions: {Options}\nAnswer: {Answer}\nExplanation: {Explanation}"""
 
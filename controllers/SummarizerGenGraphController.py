@@ -14,12 +14,12 @@ from langgraph.types import interrupt
 config = get_settings()
 
 def SummarizerMainPointNode(state: SummaryGenState) -> SummaryGenState:
-    llm = LLMProviderFactory(config).create(
+    summarizer_main_point_llm = LLMProviderFactory(config).create_chain(
+        SummarizerMainPointPrompt,
         config.SUMMARIZER_MAINPOINT_PROVIDER, 
         config.SUMMARIZER_MAINPOINT_MODEL_ID, 
         config.SUMMARIZER_MAINPOINT_TEMPERATURE
     )
-    summarizer_main_point_llm = SummarizerMainPointPrompt | llm
     response = summarizer_main_point_llm.invoke({"context": state["context"]})
 
     state["Main_Points"] = response
@@ -29,12 +29,12 @@ def SummarizerMainPointNode(state: SummaryGenState) -> SummaryGenState:
 
 async def SummarizerMainPointNodeStream(state: SummaryGenState) -> SummaryGenState:
 
-    llm = LLMProviderFactory(config).create(
+    summarizer_main_point_llm = LLMProviderFactory(config).create_chain(
+        SummarizerMainPointPrompt,
         config.SUMMARIZER_MAINPOINT_PROVIDER, 
         config.SUMMARIZER_MAINPOINT_MODEL_ID, 
         config.SUMMARIZER_MAINPOINT_TEMPERATURE
     )
-    summarizer_main_point_llm = SummarizerMainPointPrompt | llm
     response = await summarizer_main_point_llm.ainvoke({"context": state["context"]})
 
     state["Main_Points"] = response.content if hasattr(response, 'content') else str(response)
@@ -42,12 +42,12 @@ async def SummarizerMainPointNodeStream(state: SummaryGenState) -> SummaryGenSta
     return state
 
 def SummarizerWriterNode(state: SummaryGenState) -> SummaryGenState:
-    llm = LLMProviderFactory(config).create(
+    summarizer_writer_llm = LLMProviderFactory(config).create_chain(
+        SummarizerGenPrompt,
         config.SUMMARIZER_WRITER_PROVIDER, 
         config.SUMMARIZER_WRITER_MODEL_ID, 
         config.SUMMARIZER_WRITER_TEMPERATURE
     )
-    summarizer_writer_llm = SummarizerGenPrompt | llm
     response = summarizer_writer_llm.invoke({"context": state["context"], "table_of_contents": state["Main_Points"]})
 
     state["summary"] = response
@@ -56,12 +56,12 @@ def SummarizerWriterNode(state: SummaryGenState) -> SummaryGenState:
 
 async def SummarizerWriterNodeStream(state: SummaryGenState) -> SummaryGenState:
 
-    llm = LLMProviderFactory(config).create(
+    summarizer_writer_llm = LLMProviderFactory(config).create_chain(
+        SummarizerGenPrompt,
         config.SUMMARIZER_WRITER_PROVIDER, 
         config.SUMMARIZER_WRITER_MODEL_ID, 
         config.SUMMARIZER_WRITER_TEMPERATURE
     )
-    summarizer_writer_llm = SummarizerGenPrompt | llm
     response = await summarizer_writer_llm.ainvoke({"context": state["context"], "table_of_contents": state["Main_Points"]})
 
     state["summary"] = response.content if hasattr(response, 'content') else str(response)
@@ -111,12 +111,12 @@ def Router(state: SummaryGenState):
 def SummarizerRewriterNode(state: SummaryGenState) -> SummaryGenState:
     state["old_summary"] = state["summary"] 
 
-    llm = LLMProviderFactory(config).create(
+    summarizer_rewriter_llm = LLMProviderFactory(config).create_chain(
+        SummarizerRewriterPrompt,
         config.SUMMARIZER_REWRITER_PROVIDER, 
         config.SUMMARIZER_REWRITER_MODEL_ID, 
         config.SUMMARIZER_REWRITER_TEMPERATURE
     )
-    summarizer_rewriter_llm = SummarizerRewriterPrompt | llm
     response = summarizer_rewriter_llm.invoke({
         "context": state["context"], 
         "original_summary": state["old_summary"],
@@ -130,12 +130,12 @@ def SummarizerRewriterNode(state: SummaryGenState) -> SummaryGenState:
 async def SummarizerRewriterNodeStream(state: SummaryGenState) -> SummaryGenState:
     state["old_summary"] = state["summary"] 
 
-    llm = LLMProviderFactory(config).create(
+    summarizer_rewriter_llm = LLMProviderFactory(config).create_chain(
+        SummarizerRewriterPrompt,
         config.SUMMARIZER_REWRITER_PROVIDER, 
         config.SUMMARIZER_REWRITER_MODEL_ID, 
         config.SUMMARIZER_REWRITER_TEMPERATURE
     )
-    summarizer_rewriter_llm = SummarizerRewriterPrompt | llm
     response = await summarizer_rewriter_llm.ainvoke({
         "context": state["context"], 
         "original_summary": state["old_summary"],
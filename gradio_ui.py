@@ -1,10 +1,12 @@
 import gradio as gr
 import httpx
 import json
+import time
 from typing import List, Tuple
 
 # API Configuration
 API_BASE_URL = "http://127.0.0.1:8000"
+TEXT_PREVIEW_BYTES = 64 * 1024
 
 # Custom CSS for clean, modern design
 custom_css = """
@@ -97,6 +99,10 @@ class GradioUI:
             if response.status_code == 200:
                 result = response.json()
                 asset_id = result["id"]
+
+                job = self.wait_for_job(result["job_id"])
+                if job.get("status") != "completed":
+                    return "", f"❌ Processing failed: {job.get('error', 'Unknown error')}", ""
                 
                 # Fetch the extracted text
                 extracted_text = self.get_extracted_text(asset_id)
@@ -113,6 +119,19 @@ class GradioUI:
         except Exception as e:
             return "", f"❌ Error uploading file: {str(e)}", ""
 
+    def wait_for_job(self, job_id: str, poll_interval: float = 2.0) -> dict:
+        """Poll an ingestion job until it completes or fails"""
+        timeout = httpx.Timeout(30.0, connect=10.0)
+        with httpx.Client(timeout=timeout) as client:
+            while True:
+                response = client.get(f"{API_BASE_URL}/jobs/{job_id}")
+                if response.status_code != 200:
+                    return {"status": "failed", "error": response.text}
+                job = response.json()
+                if job.get("status") in ("completed", "failed"):
+                    return job
+                time.sleep(poll_interval)
+
     def get_extracted_text(self, asset_id: str) -> str:
         """Retrieve extracted text for a given asset ID"""
         if not asset_id.strip():
@@ -121,11 +140,14 @@ class GradioUI:
         try:
             timeout = httpx.Timeout(30.0, connect=10.0)
             with httpx.Client(timeout=timeout) as client:
-                response = client.get(f"{API_BASE_URL}/get_extracted_text/{asset_id.strip()}")
+                response = client.get(f"{API_BASE_URL}/get_extracted_text/{asset_id.strip()}", params={"max_bytes": TEXT_PREVIEW_BYTES})
             
             if response.status_code == 200:
                 result = response.json()
-                return result.get("extracted_text", "")
+                extracted_text = result.get("extracted_text", "")
+                if result.get("next_start_byte") is not None: # only the first page is loaded as a preview
+                    extracted_text += f"\n\n... (preview: first {result['end_byte']:,} of {result['total_bytes']:,} bytes)"
+                return extracted_text
             else:
                 return f"❌ Failed to retrieve extracted text: {response.text}"
                 
@@ -12,6 +12,27 @@ class Settings(BaseSettings):
     LANGSMITH_API_KEY: str = None
     LANGSMITH_PROJECT: str = None
 
+    # Shared LLM client connection pools
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    LLM_KEEPALIVE_EXPIRY: float = 30.0
+
+    # Background ingestion jobs
+    INGEST_WORKERS: int = 2
+
+    # PDF extraction configuration
+    PDF_EXTRACT_WORKERS: int = 4
+    PDF_PAGES_PER_TASK: int = 16
+
+    # Transcription worker pool configuration
+    WHISPER_MODEL_SIZE: str = "tiny"
+    TRANSCRIPTION_WORKERS: int = 1
+    TRANSCRIPTION_QUEUE_SIZE: int = 8
+    TRANSCRIPTION_PRELOAD: bool = False
+    TRANSCRIPTION_CHUNKED: bool = False
+    TRANSCRIPTION_WINDOW_SECONDS: int = 300
+    TRANSCRIPTION_WINDOW_OVERLAP_SECONDS: int = 5
+
     # Question Generation Agent configuration
     QUESTION_GENERATER_PROVIDER: str
     QUESTION_GENERATER_MODEL_ID: str
@@ -39,6 +60,11 @@ class Settings(BaseSettings):
     SUMMARIZER_REWRITER_TEMPERATURE: float
 
     # Question Answering Agent configuration
+    QA_GRAPH_MODE: str = "two_stage"
+    TOPIC_GATE_ENABLED: bool = False
+    TOPIC_GATE_LOW: float = 0.0
+    TOPIC_GATE_HIGH: float = 1.0
+
     GRADE_QA_PROVIDER: str
     GRADE_QA_MODEL_ID: str
     GRADE_QA_TEMPERATURE: float
@@ -49,8 +75,40 @@ class Settings(BaseSettings):
 
     EMBEDDING_MODEL_ID: str
     EMBEDDING_MODEL_PROVIDER: str
+    EMBEDDING_DEVICE: str = "cpu"
+    EMBEDDING_PRELOAD: bool = True
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_BACKEND: str = "torch"
+    EMBEDDING_ONNX_FILE_NAME: str = "onnx/model_qint8_avx2.onnx"
+    EMBEDDING_QUERY_BATCHING: bool = True
+    EMBEDDING_QUERY_MAX_BATCH_SIZE: int = 32
+    EMBEDDING_QUERY_MAX_WAIT_MS: float = 5.0
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_DIR: str = "assets/.embedding_cache"
+    EMBEDDING_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    RETRIEVER_BACKEND: str = "chroma"
+    FLAT_INDEX_DTYPE: str = "float32"
+    FLAT_INDEX_RESCORE_FACTOR: int = 4
+    FLAT_INDEX_INT8_KEEP_ORIGINALS: bool = False
+    RETRIEVER_ANN: str = "none"
+    IVF_NLIST: int = 0
+    IVF_NPROBE: int = 8
+    IVF_MIN_VECTORS: int = 20000
+    RETRIEVER_HYBRID: bool = True
+    HYBRID_CANDIDATES: int = 20
+    HYBRID_RRF_K: int = 60
+    RETRIEVER_SHARD_CACHE_SIZE: int = 32
+    RETRIEVER_SHARD_WORKERS: int = 8
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL_ID: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_DEVICE: str = "cpu"
+    RERANK_CANDIDATES: int = 20
+    RERANK_TOP_K: int = 3
     CHUNK_SIZE: int
     CHUNK_OVERLAP: int
+    PARENT_CHUNK_ENABLED: bool = True
+    PARENT_CHUNK_SIZE: int = 1400
+    QA_CONTEXT_MAX_TOKENS: int = 1500
 
     class Config:
         env_file = ".env"
@@ -1,2 +1,2 @@
 from .Config import *
-from .text_splitter import text_splitter
\ No newline at end of file
+from .text_splitter import text_splitter, split_with_parents
\ No newline at end of file
@@ -32,4 +32,42 @@ def text_splitter(text:str, type:int = 1, chunk_size:int=2000, chunk_overlap:int
         splitter = SpacyTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separator = "\n",  pipeline = 'sentencizer') 
          
     
-    return splitter.split_text(text)
\ No newline at end of file
+    return splitter.split_text(text)
+
+def split_with_parents(text: str, chunk_size: int, chunk_overlap: int, parent_size: int, separators: list[str] = ["\n\n", "\n", " ", ""]) -> tuple[list[str], list[int], list[tuple[int, int]]]:
+    """
+    Splits the text into small child chunks and, in the same pass, groups consecutive children into
+    parent spans of at most parent_size characters (a child longer than that is its own parent).
+
+    Returns:
+        tuple: (child chunks, parent id of each child, (start, end) UTF-8 byte offsets of each parent in text).
+    """
+    children = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=separators
+    ).split_text(text)
+
+    chunk_parents, char_spans = [], []
+    search_from = 0
+    for child in children:
+        start = text.find(child, search_from)
+        if start < 0: # not expected, the splitter only strips chunk ends
+            start = search_from
+        end = start + len(child)
+        search_from = max(start + 1, end - chunk_overlap)
+
+        if char_spans and end - char_spans[-1][0] <= parent_size:
+            char_spans[-1][1] = max(char_spans[-1][1], end)
+        else:
+            char_spans.append([start, end])
+        chunk_parents.append(len(char_spans) - 1)
+
+    # character -> byte offsets in one forward sweep over the sorted span boundaries
+    byte_offsets, char_pos, byte_pos = {}, 0, 0
+    for point in sorted({p for span in char_spans for p in span}):
+        byte_pos += len(text[char_pos:point].encode("utf-8"))
+        char_pos = point
+        byte_offsets[point] = byte_pos
+
+    return children, chunk_parents, [(byte_offsets[s], byte_offsets[e]) for s, e in char_spans]
@@ -0,0 +1,188 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LOG_COMPACT_MIN_RECORDS = 4096 # the log is folded into index.json once it has this many records and more than entries
+
+class EmbeddingCache:
+    """
+    On-disk cache of chunk embeddings for one embedding setup (see cache_namespace), keyed by the hash of the whitespace-normalized chunk text.
+    Vectors live in a fixed-size memory-mapped float32 array (capacity derived from max_bytes). The hash -> slot
+    index is a JSON snapshot in LRU order plus an append-only log of evictions ("-hash") and insertions
+    ("+hash slot"), folded into a new snapshot once it grows as large as the index. When the array is full the
+    least recently used slot is reused: its eviction is logged and synced before the slot is overwritten, and an
+    insertion is logged only after its vector is flushed, so after a crash a hash never maps to another vector.
+    """
+    def __init__(self, cache_dir: str, namespace: str, dim: int, max_bytes: int):
+        self.dim = dim
+        self.capacity = max(max_bytes // (dim * 4), 1)
+        self.dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", namespace))
+        self._vectors_path = os.path.join(self.dir, "vectors.f32")
+        self._index_path = os.path.join(self.dir, "index.json")
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, int]" = OrderedDict()
+        self._generation = 0
+        self._log = None
+        self._log_records = 0
+        self._open()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+    def _log_path(self, generation: int) -> str:
+        return os.path.join(self.dir, f"index.{generation}.log")
+
+    def _open(self):
+        os.makedirs(self.dir, exist_ok=True)
+        index = None
+        if os.path.exists(self._index_path) and os.path.exists(self._vectors_path):
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("dim") != self.dim or index.get("capacity") != self.capacity:
+                index = None # size settings changed, start over
+
+        mode = "r+" if index is not None else "w+"
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode=mode, shape=(self.capacity, self.dim))
+        if index is not None:
+            self._lru = OrderedDict((key, slot) for key, slot in index["entries"])
+            self._generation = index.get("generation", 0)
+            self._replay_log()
+        used = set(self._lru.values())
+        self._free = [slot for slot in range(self.capacity - 1, -1, -1) if slot not in used]
+        self._save_index() # a fresh snapshot with an empty log of the next generation
+
+    def _replay_log(self):
+        path = self._log_path(self._generation)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break # torn last record of a crash
+                if line.startswith("-"):
+                    self._lru.pop(line[1:-1], None)
+                elif line.startswith("+"):
+                    key, slot = line[1:-1].split(" ")
+                    self._lru.pop(key, None)
+                    self._lru[key] = int(slot)
+
+    def _save_index(self):
+        """Writes the whole index as a snapshot and starts an empty log; logs of older generations are removed."""
+        if self._log is not None:
+            self._log.close()
+        self._generation += 1
+        tmp_path = f"{self._index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"dim": self.dim, "capacity": self.capacity, "generation": self._generation, "entries": list(self._lru.items())},
+                f, separators=(",", ":")
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._index_path)
+        for file_name in os.listdir(self.dir):
+            if file_name.startswith("index.") and file_name.endswith(".log") and file_name != f"index.{self._generation}.log":
+                os.remove(os.path.join(self.dir, file_name))
+        self._log = open(self._log_path(self._generation), "a", encoding="utf-8")
+        self._log_records = 0
+
+    def _append_log(self, records: List[str]):
+        if not records:
+            return
+        self._log.write("".join(records))
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._log_records += len(records)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors for the keys that are present; hits become most recently used (persisted at the next snapshot)."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                slot = self._lru.get(key)
+                if slot is not None and key not in found:
+                    self._lru.move_to_end(key)
+                    found[key] = np.array(self._vectors[slot])
+        return found
+
+    def put_many(self, items: List[Tuple[str, np.ndarray]]):
+        """Stores vectors, evicting the least recently used entries when the cache is full."""
+        if not items:
+            return
+        with self._lock:
+            evicted, inserted = [], {}
+            for key, vector in items:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    continue
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    evicted_key, slot = self._lru.popitem(last=False)
+                    evicted.append(f"-{evicted_key}\n")
+                    inserted.pop(evicted_key, None) # more items than capacity: an item of this call is evicted again
+                self._lru[key] = slot
+                inserted[key] = (slot, vector)
+
+            self._append_log(evicted) # evictions are durable before their slots are overwritten
+            for slot, vector in inserted.values():
+                self._vectors[slot] = vector
+            self._vectors.flush()
+            self._append_log([f"+{key} {slot}\n" for key, (slot, _) in inserted.items()])
+
+            if self._log_records >= max(LOG_COMPACT_MIN_RECORDS, len(self._lru)):
+                self._save_index()
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+def cache_namespace(provider: str, model_id: str, max_seq_length: int, variant: Optional[str] = None) -> str:
+    """
+    Cache namespace of an embedding setup. The same model gives different vectors for chunks longer than
+    max_seq_length under another truncation, provider pipeline or backend, so they never share entries.
+    """
+    parts = [provider, model_id, f"seq{max_seq_length}"] + ([variant] if variant else [])
+    return "-".join(parts)
+
+_caches: Dict[Tuple[str, str], EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(cache_dir: str, namespace: str, dim: int, max_bytes: int) -> EmbeddingCache:
+    """Process-wide cache instance per (cache_dir, namespace)."""
+    key = (os.path.abspath(cache_dir), namespace)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(cache_dir, namespace, dim, max_bytes)
+        return _caches[key]
+
+def embed_with_cache(cache: Optional[EmbeddingCache], texts: List[str], encode) -> np.ndarray:
+    """
+    Embeds texts as a float32 matrix, encoding (once) only the chunks missing from the cache.
+    encode receives a list of texts and returns a matrix of embeddings.
+    """
+    if cache is None:
+        return np.asarray(encode(texts), dtype=np.float32)
+
+    keys = [EmbeddingCache.key(text) for text in texts]
+    vectors = cache.get_many(keys)
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors and key not in missing:
+            missing[key] = text
+    if missing:
+        encoded = np.asarray(encode(list(missing.values())), dtype=np.float32)
+        new_items = list(zip(missing.keys(), encoded))
+        cache.put_many(new_items)
+        vectors.update(new_items)
+
+    if not texts:
+        return np.zeros((0, cache.dim), dtype=np.float32)
+    return np.stack([vectors[key] for key in keys])
@@ -0,0 +1,79 @@
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+RegistryKey = Tuple[str, str, str, str]
+
+def _rss_bytes() -> int:
+    """Best-effort resident set size of the current process (0 when unavailable)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError, IndexError):
+        return 0
+
+def _parameter_bytes(model: Any) -> int:
+    """Size of the model weights when the model exposes torch parameters."""
+    module = getattr(model, "_client", model)
+    if not hasattr(module, "parameters"):
+        return 0
+    return sum(p.numel() * p.element_size() for p in module.parameters())
+
+class EmbeddingModelRegistry:
+    """
+    Process-wide registry of loaded embedding models keyed by (provider, model_id, device, backend).
+    Each model is loaded once and shared by every request and graph node.
+    """
+    def __init__(self):
+        self._models: Dict[RegistryKey, Any] = {}
+        self._stats: Dict[RegistryKey, Dict[str, Any]] = {}
+        self._key_locks: Dict[RegistryKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, model_id: str, device: str, loader: Callable[[], Any], backend: str = "torch") -> Any:
+        """Returns the model for the key, calling loader only the first time it is requested."""
+        key = (provider, model_id, device, backend)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock: # loading one model does not block lookups or loads of other models
+            model = self._models.get(key)
+            if model is not None:
+                return model
+
+            rss_before = _rss_bytes()
+            start = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start
+
+            self._stats[key] = {
+                "provider": provider,
+                "model_id": model_id,
+                "device": device,
+                "backend": backend,
+                "load_seconds": round(load_seconds, 3),
+                "rss_delta_bytes": max(_rss_bytes() - rss_before, 0),
+                "parameter_bytes": _parameter_bytes(model),
+                "loaded_at": time.time(),
+            }
+            self._models[key] = model
+            print(f"Loaded embedding model {model_id} ({provider}, {device}, {backend}) in {load_seconds:.2f}s")
+
+        return model
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Load time and memory footprint of every resident model."""
+        return [dict(s) for s in self._stats.values()]
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+            self._key_locks.clear()
+
+embedding_model_registry = EmbeddingModelRegistry()
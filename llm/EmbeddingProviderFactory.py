@@ -1,14 +1,34 @@
-from langchain_huggingface import HuggingFaceEmbeddings
 from .providers.LocalEmbeddingProvider import LocalEmbeddingProvider
+from .providers.HuggingFaceEmbedding import HuggingFaceEmbedding
 from .Enums import EmbeddingEnums
 
 class EmbeddingProviderFactory:
     def __init__(self, config: dict):
         self.config = config
 
-    def create(self, provider: str, model_name: str = None):
+    def create(self, provider: str, model_name: str = None, device: str = "cpu"):
+        cache_kwargs = {}
+        if self.config.EMBEDDING_CACHE_ENABLED:
+            cache_kwargs = {"cache_dir": self.config.EMBEDDING_CACHE_DIR, "cache_max_bytes": self.config.EMBEDDING_CACHE_MAX_BYTES}
+
         if provider == EmbeddingEnums.LOCAL_EMBEDDING.value:
-            return LocalEmbeddingProvider()
+            backend_kwargs = {"backend": self.config.EMBEDDING_BACKEND, "onnx_file_name": self.config.EMBEDDING_ONNX_FILE_NAME}
+            if model_name:
+                return LocalEmbeddingProvider(model_id=model_name, device=device, **backend_kwargs, **cache_kwargs)
+            return LocalEmbeddingProvider(device=device, **backend_kwargs, **cache_kwargs)
         elif provider == EmbeddingEnums.HUGGINGFACE.value:
-            return HuggingFaceEmbeddings(model_name=model_name)
+            return HuggingFaceEmbedding(
+                model_id=model_name or "sentence-transformers/all-MiniLM-L6-v2",
+                device=device,
+                batch_size=self.config.EMBEDDING_BATCH_SIZE,
+                **cache_kwargs
+            )
         return None
+
+    def preload(self):
+        """Loads the configured embedding model into the registry so the first request is warm."""
+        return self.create(
+            self.config.EMBEDDING_MODEL_PROVIDER,
+            self.config.EMBEDDING_MODEL_ID,
+            self.config.EMBEDDING_DEVICE
+        )
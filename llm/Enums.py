@@ -9,3 +9,6 @@ class EmbeddingEnums(Enum):
     LOCAL_EMBEDDING = "LOCAL_EMBEDDING"
     HUGGINGFACE = "HUGGINGFACE"    
 
+
+class RerankerEnums(Enum):
+    CROSS_ENCODER = "CROSS_ENCODER"
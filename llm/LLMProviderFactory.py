@@ -1,17 +1,82 @@
+import threading
+import httpx
 from langchain_ollama import ChatOllama
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_groq import ChatGroq
 from .Enums import LLMEnums
 
 class LLMProviderFactory:
+    # Shared across factory instances so every graph node reuses the same clients and connections.
+    _models: dict = {}
+    _chains: dict = {}
+    _lock = threading.Lock()
+    _http_client: httpx.Client = None
+    _http_async_client: httpx.AsyncClient = None
+
     def __init__(self, config: dict):
         self.config = config
 
-    def create(self, provider: str, model_id: str = None, model_temperature: float = 0.2):
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.config.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=self.config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=self.config.LLM_KEEPALIVE_EXPIRY
+        )
+
+    def _shared_http_clients(self):
+        """Bounded keep-alive pools shared by every HTTP based chat model."""
+        cls = LLMProviderFactory
+        if cls._http_client is None:
+            cls._http_client = httpx.Client(limits=self._limits())
+            cls._http_async_client = httpx.AsyncClient(limits=self._limits())
+        return cls._http_client, cls._http_async_client
+
+    def _build(self, provider: str, model_id: str, model_temperature: float):
         if provider == LLMEnums.OLLAMA.value:
-            return ChatOllama(model=model_id, temperature=model_temperature)
+            return ChatOllama(model=model_id, temperature=model_temperature, client_kwargs={"limits": self._limits()})
         elif provider == LLMEnums.GOOGLE_GENAI.value:
             return ChatGoogleGenerativeAI(model=model_id, temperature=model_temperature)
         elif provider == LLMEnums.GROQ.value:
-            return ChatGroq(model=model_id, temperature=model_temperature)
-        return None
\ No newline at end of file
+            http_client, http_async_client = self._shared_http_clients()
+            return ChatGroq(
+                model=model_id,
+                temperature=model_temperature,
+                http_client=http_client,
+                http_async_client=http_async_client
+            )
+        return None
+
+    def create(self, provider: str, model_id: str = None, model_temperature: float = 0.2):
+        """Returns the cached chat model for (provider, model_id, temperature), building it once."""
+        key = (provider, model_id, model_temperature)
+        llm = self._models.get(key)
+        if llm is None:
+            with self._lock:
+                llm = self._models.get(key)
+                if llm is None:
+                    llm = self._build(provider, model_id, model_temperature)
+                    if llm is not None:
+                        self._models[key] = llm
+        return llm
+
+    def create_chain(self, prompt, provider: str, model_id: str = None, model_temperature: float = 0.2, output_schema=None):
+        """
+        Returns the memoized `prompt | llm` runnable (with structured output when output_schema is given),
+        so the hot path only formats the prompt and sends the request.
+        Prompts are expected to be module level objects; the cache keeps a reference to each one.
+        """
+        key = (id(prompt), provider, model_id, model_temperature, output_schema)
+        cached = self._chains.get(key)
+        if cached is not None:
+            return cached[1]
+
+        llm = self.create(provider, model_id, model_temperature)
+        if llm is None:
+            return None
+        if output_schema is not None:
+            llm = llm.with_structured_output(output_schema)
+        chain = prompt | llm
+
+        with self._lock:
+            self._chains.setdefault(key, (prompt, chain))
+        return self._chains[key][1]
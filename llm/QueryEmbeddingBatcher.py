@@ -0,0 +1,166 @@
+import time
+import queue
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Tuple
+
+from langchain.embeddings.base import Embeddings
+
+class QueryEmbeddingBatcher:
+    """
+    Collects concurrent embed_query calls for up to max_wait_ms and encodes them as one batch
+    (at most max_batch_size texts) on a background thread; each caller gets its own vector back.
+    The last recent_size query vectors are kept, so a question embedded for retrieval is not
+    encoded again by later steps of the same turn.
+    """
+    def __init__(
+        self,
+        encode: Callable[[List[str]], Any],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "",
+        recent_size: int = 256
+    ):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread: threading.Thread = None
+        self._lock = threading.Lock()
+        self._recent: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.recent_size = recent_size
+        self._stats = {"requests": 0, "recent_hits": 0, "batches": 0, "max_batch_size": 0, "encode_seconds": 0.0, "batch_sizes": {}}
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"query-embedding-batcher-{self.name}", daemon=True)
+                self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        with self._lock:
+            vector = self._recent.get(text)
+            if vector is not None:
+                self._recent.move_to_end(text)
+                self._stats["recent_hits"] += 1
+        if vector is not None:
+            future.set_result(list(vector))
+            return future
+
+        self._ensure_started()
+        self._queue.put((text, future))
+        return future
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                self._run_batch(self._collect())
+            except Exception as e: # the only batcher thread must survive anything, or later queries hang
+                print(f"ERROR: Query embedding batcher {self.name} failed: {str(e)}")
+
+    def _run_batch(self, batch: List[Tuple[str, Future]]):
+        # cancelled callers (e.g. a disconnected client) are dropped; the rest can no longer be cancelled
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            vectors = [[float(x) for x in vector] for vector in self.encode([text for text, _ in batch])]
+            self._remember(batch, vectors)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(list(vector))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        self._record(len(batch), time.perf_counter() - start)
+
+    def _remember(self, batch: List[Tuple[str, Future]], vectors: List[List[float]]):
+        with self._lock:
+            for (text, _), vector in zip(batch, vectors):
+                self._recent[text] = vector
+                self._recent.move_to_end(text)
+            while len(self._recent) > self.recent_size:
+                self._recent.popitem(last=False)
+
+    def _record(self, batch_size: int, encode_seconds: float):
+        with self._lock:
+            stats = self._stats
+            stats["requests"] += batch_size
+            stats["batches"] += 1
+            stats["max_batch_size"] = max(stats["max_batch_size"], batch_size)
+            stats["encode_seconds"] += encode_seconds
+            bucket = str(1 << (batch_size - 1).bit_length()) # batch sizes bucketed by the next power of two
+            stats["batch_sizes"][bucket] = stats["batch_sizes"].get(bucket, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, batch_sizes=dict(self._stats["batch_sizes"]))
+        batches = max(stats["batches"], 1)
+        return {
+            "name": self.name,
+            "queue_depth": self._queue.qsize(),
+            "max_batch_size_limit": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "requests": stats["requests"],
+            "recent_hits": stats["recent_hits"],
+            "batches": stats["batches"],
+            "mean_batch_size": round(stats["requests"] / batches, 2),
+            "max_batch_size": stats["max_batch_size"],
+            "mean_encode_ms": round(stats["encode_seconds"] * 1000 / batches, 3),
+            "batch_size_histogram": stats["batch_sizes"],
+        }
+
+class BatchedQueryEmbeddings(Embeddings):
+    """Embeddings whose queries go through a shared QueryEmbeddingBatcher; documents are embedded directly."""
+    def __init__(self, embedding: Embeddings, batcher: QueryEmbeddingBatcher):
+        self.embedding = embedding
+        self.batcher = batcher
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embedding.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.batcher.aembed_query(text)
+
+_batchers: Dict[Tuple, QueryEmbeddingBatcher] = {}
+_batchers_lock = threading.Lock()
+
+def get_query_batcher(key: Tuple, embedding: Embeddings, max_batch_size: int = 32, max_wait_ms: float = 5.0) -> QueryEmbeddingBatcher:
+    """Process-wide batcher per embedding model key; queries are encoded without the document cache."""
+    with _batchers_lock:
+        if key not in _batchers:
+            encode = getattr(embedding, "embed_queries", embedding.embed_documents)
+            _batchers[key] = QueryEmbeddingBatcher(encode, max_batch_size, max_wait_ms, name="/".join(map(str, key)))
+        return _batchers[key]
+
+def query_batcher_stats() -> List[Dict[str, Any]]:
+    with _batchers_lock:
+        batchers = list(_batchers.values())
+    return [batcher.stats() for batcher in batchers]
@@ -0,0 +1,36 @@
+from typing import List
+import numpy as np
+from sentence_transformers import CrossEncoder
+from ..Enums import RerankerEnums
+from ..EmbeddingModelRegistry import embedding_model_registry
+
+class CrossEncoderReranker:
+    """
+    Local cross-encoder that scores (query, passage) pairs jointly. All candidates of a query
+    are scored in one forward pass, sorted by length so the batch pads to similar lengths.
+    """
+    def __init__(self, model_id: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", device: str = "cpu"):
+        self.model_id = model_id
+        self.device = device
+        self.model = self._get_model()
+
+    def _get_model(self) -> CrossEncoder:
+        """Get the shared model from the registry, loading it on first use."""
+        return embedding_model_registry.get(
+            RerankerEnums.CROSS_ENCODER.value, self.model_id, self.device,
+            lambda: CrossEncoder(self.model_id, device=self.device)
+        )
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """Relevance scores of texts for the query as float32, in input order (higher is more relevant)."""
+        scores = np.empty(len(texts), dtype=np.float32)
+        if not texts:
+            return scores
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        scores[order] = self.model.predict(
+            [(query, texts[i]) for i in order],
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return scores
@@ -1,49 +1,65 @@
-from typing import Dict, List, Optional, Any, Callable, Union
-from langchain_community.embeddings import HuggingFaceEmbeddings 
+from typing import List, Optional
+import numpy as np
+from sentence_transformers import SentenceTransformer
 from langchain.embeddings.base import Embeddings
+from ..Enums import EmbeddingEnums
+from ..EmbeddingModelRegistry import embedding_model_registry
+from ..EmbeddingCache import get_embedding_cache, embed_with_cache, cache_namespace
 
-class HuggingFaceEmbedding(Embeddings): 
-    def __init__(self, 
+class HuggingFaceEmbedding(Embeddings):
+    """
+    Sentence-transformers model from the Hugging Face hub, encoded in batches.
+    Texts are sorted by length before batching so each batch pads to similar lengths;
+    output is L2-normalized float32.
+    """
+    def __init__(self,
                        model_id: str = "sentence-transformers/all-MiniLM-L6-v2",
                        device: str = "cpu",
-                       normalize_embeddings: bool = False,
-                       embedding_size: int = 384):
+                       batch_size: int = 64,
+                       cache_dir: Optional[str] = None,
+                       cache_max_bytes: int = 256 * 1024 * 1024):
 
         self.model_id = model_id
         self.device = device
-        self.embedding_model: Optional[HuggingFaceEmbeddings] = None
-        self.normalize_embeddings = normalize_embeddings
-
-    def _init_model(self):
-        """Initialize the embedding model."""
-        hf = HuggingFaceEmbeddings(
-            model_name=self.model_id,
-            model_kwargs={'device': self.device},
-            encode_kwargs={'normalize_embeddings': self.normalize_embeddings}
+        self.batch_size = batch_size
+        self.embedding_model = self._get_model()
+        self.cache = None
+        if cache_dir:
+            dim = self.embedding_model.get_sentence_embedding_dimension()
+            namespace = cache_namespace(EmbeddingEnums.HUGGINGFACE.value, self.model_id, self.embedding_model.max_seq_length)
+            self.cache = get_embedding_cache(cache_dir, namespace, dim, cache_max_bytes)
+
+    def _get_model(self) -> SentenceTransformer:
+        """Get the shared model from the registry, loading it on first use."""
+        return embedding_model_registry.get(
+            EmbeddingEnums.HUGGINGFACE.value, self.model_id, self.device,
+            lambda: SentenceTransformer(self.model_id, device=self.device)
         )
-        return hf
-    
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for a list of documents."""
-        if not self.embedding_model:
-            self.embedding_model = self._init_model()
 
-        embeddings = [self.embed_query(doc) for doc in texts]
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encodes texts as a (len(texts), dim) normalized float32 matrix, in input order."""
+        dim = self.embedding_model.get_sentence_embedding_dimension()
+        embeddings = np.empty((len(texts), dim), dtype=np.float32)
+        order = np.argsort([-len(text) for text in texts], kind="stable")
 
+        for start in range(0, len(order), self.batch_size):
+            batch_ids = order[start:start + self.batch_size]
+            embeddings[batch_ids] = self.embedding_model.encode(
+                [texts[i] for i in batch_ids],
+                batch_size=len(batch_ids),
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
         return embeddings
 
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for a list of documents."""
+        return embed_with_cache(self.cache, texts, self.encode).tolist()
 
-    def embed_query(self, splites: str) -> List[float]:
-        """Generate embedding for a single query text."""
-        if not self.embedding_model:
-            self.embedding_model = self._init_model()
-
-        embeddings_texts = []   
-
-        if isinstance(splites, str):
-            splites = [splites]
-
-        for query in splites:
-            embeddings_texts.append(self.embed_query(query))
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Embeds a batch of queries, bypassing the document cache."""
+        return self.encode(texts)
 
-        return embeddings_texts
\ No newline at end of file
+    def embed_query(self, text: str) -> List[float]:
+        """Generate embedding for a single query text."""
+        return self.encode([text])[0].tolist()
@@ -3,36 +3,80 @@ import numpy as np
 import os
 from sentence_transformers import SentenceTransformer, models
 from langchain.embeddings.base import Embeddings # Import the base class
+from ..Enums import EmbeddingEnums
+from ..EmbeddingModelRegistry import embedding_model_registry
+from ..EmbeddingCache import get_embedding_cache, embed_with_cache, cache_namespace
 
 class LocalEmbeddingProvider(Embeddings): # Inherit from Embeddings
     def __init__(self, 
                        model_id: str = "sentence-transformers/all-MiniLM-L6-v2",
-                       embedding_size: int = 384):
+                       embedding_size: int = 384,
+                       device: str = "cpu",
+                       backend: str = "torch",
+                       onnx_file_name: str = "onnx/model_qint8_avx2.onnx",
+                       cache_dir: Optional[str] = None,
+                       cache_max_bytes: int = 256 * 1024 * 1024):
+
+        if "/" not in model_id and not os.path.isdir(model_id): # short names refer to the sentence-transformers hub org
+            model_id = f"sentence-transformers/{model_id}"
 
         self.model_id = model_id
         self.embedding_size = embedding_size
-        self.embedding_model = self._init_model()
+        self.device = device
+        self.backend = backend
+        self.onnx_file_name = onnx_file_name
+        self.embedding_model = self._get_model()
+        self.cache = None
+        if cache_dir: # document embeddings are shared across assets through the on-disk cache
+            dim = self.embedding_model.get_sentence_embedding_dimension()
+            namespace = cache_namespace(
+                EmbeddingEnums.LOCAL_EMBEDDING.value, self.model_id, self.embedding_model.max_seq_length,
+                None if backend == "torch" else onnx_file_name
+            )
+            self.cache = get_embedding_cache(cache_dir, namespace, dim, cache_max_bytes)
+
+    def _get_model(self):
+        """Get the shared model from the registry, loading it on first use."""
+        backend = self.backend if self.backend == "torch" else f"{self.backend}:{self.onnx_file_name}"
+        return embedding_model_registry.get(
+            EmbeddingEnums.LOCAL_EMBEDDING.value, self.model_id, self.device, self._init_model, backend=backend
+        )
     
     def _init_model(self):
-        """Initialize the embedding model."""
-        transformer = models.Transformer(self.model_id, max_seq_length=128)
+        """
+        Initialize the embedding model. backend="onnx" runs the exported ONNX graph from the model
+        repository (onnx_file_name, an int8 quantized export by default) through ONNX Runtime,
+        with the same mean pooling and normalization as the PyTorch model.
+        """
+        if self.backend == "onnx":
+            transformer = models.Transformer(
+                self.model_id, max_seq_length=128, backend="onnx", model_args={"file_name": self.onnx_file_name}
+            )
+        else:
+            transformer = models.Transformer(self.model_id, max_seq_length=128)
         pooling = models.Pooling(transformer.get_word_embedding_dimension(), pooling_mode="mean")
         normalize = models.Normalize()
-        return SentenceTransformer(modules=[transformer, pooling, normalize])
+        return SentenceTransformer(modules=[transformer, pooling, normalize], device=self.device)
         
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for a list of documents."""
         if not self.embedding_model:
-            self.embedding_model = self._init_model()
+            self.embedding_model = self._get_model()
             
-        embeddings = self.embedding_model.encode(texts, convert_to_numpy=True)
+        embeddings = embed_with_cache(
+            self.cache, texts, lambda batch: self.embedding_model.encode(batch, convert_to_numpy=True)
+        )
         
         return embeddings.tolist()
 
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Embeds a batch of queries in one forward pass, bypassing the document cache."""
+        return self.embedding_model.encode(texts, convert_to_numpy=True)
+
     def embed_query(self, text: str) -> List[float]:
         """Generate embedding for a single query text."""
         if not self.embedding_model:
-            self.embedding_model = self._init_model()
+            self.embedding_model = self._get_model()
             
         embedding = self.embedding_model.encode(text, convert_to_numpy=True)
         
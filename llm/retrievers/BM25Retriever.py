@@ -0,0 +1,137 @@
+import os
+import re
+import json
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+POSTINGS_FILE_NAME = "postings.npz"
+TERMS_FILE_NAME = "terms.json"
+CHUNKS_FILE_NAME = "chunks.json"
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-]\w+)*") # keeps identifiers and numbers like snake_case, gpt-4, 3.2 intact
+PART_PATTERN = re.compile(r"[^\W_]+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compound terms are also indexed by their parts (gradient_descent -> gradient, descent)."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = PART_PATTERN.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+class BM25Index:
+    """
+    Inverted index of an asset's chunks for exact-term (BM25) search.
+    Postings are stored as flat arrays: the postings of term t are doc_ids/tfs[offsets[t]:offsets[t + 1]].
+    """
+    def __init__(
+        self,
+        terms: Dict[str, int],
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        tfs: np.ndarray,
+        doc_lengths: np.ndarray,
+        texts: List[str],
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.texts = texts
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, texts: List[str]) -> "BM25Index":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.int32)
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        terms, offsets, doc_ids, tfs = {}, [0], [], []
+        for term_id, term in enumerate(sorted(postings)):
+            terms[term] = term_id
+            for doc_id, tf in postings[term]:
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+            offsets.append(len(doc_ids))
+
+        return cls(
+            terms,
+            np.asarray(offsets, dtype=np.int64),
+            np.asarray(doc_ids, dtype=np.int32),
+            np.minimum(np.asarray(tfs, dtype=np.int64), np.iinfo(np.uint16).max).astype(np.uint16),
+            doc_lengths,
+            texts
+        )
+
+    def save(self, index_dir: str):
+        os.makedirs(index_dir, exist_ok=True)
+        np.savez(
+            os.path.join(index_dir, POSTINGS_FILE_NAME),
+            offsets=self.offsets, doc_ids=self.doc_ids, tfs=self.tfs, doc_lengths=self.doc_lengths
+        )
+        with open(os.path.join(index_dir, TERMS_FILE_NAME), "w", encoding="utf-8") as f:
+            json.dump(sorted(self.terms, key=self.terms.get), f, ensure_ascii=False)
+        with open(os.path.join(index_dir, CHUNKS_FILE_NAME), "w", encoding="utf-8") as f:
+            json.dump(self.texts, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "BM25Index":
+        with np.load(os.path.join(index_dir, POSTINGS_FILE_NAME)) as arrays:
+            offsets, doc_ids, tfs, doc_lengths = arrays["offsets"], arrays["doc_ids"], arrays["tfs"], arrays["doc_lengths"]
+        with open(os.path.join(index_dir, TERMS_FILE_NAME), "r", encoding="utf-8") as f:
+            terms = {term: term_id for term_id, term in enumerate(json.load(f))}
+        with open(os.path.join(index_dir, CHUNKS_FILE_NAME), "r", encoding="utf-8") as f:
+            texts = json.load(f)
+        return cls(terms, offsets, doc_ids, tfs, doc_lengths, texts)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk; each query term adds its postings in one vectorized step."""
+        scores = np.zeros(len(self.texts), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.terms.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs, tf = self.doc_ids[start:end], self.tfs[start:end].astype(np.float32)
+            idf = np.log(1.0 + (len(self.texts) - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[docs] / max(self.avg_length, 1e-9))
+            scores[docs] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k chunk ids with a positive score, best first."""
+        scores = self.scores(query)
+        matching = np.flatnonzero(scores > 0)
+        top = matching[np.argsort(-scores[matching], kind="stable")[:k]]
+        return top, scores[top]
+
+class BM25Retriever(BaseRetriever):
+    """LangChain retriever over a BM25Index."""
+    index: Any
+    k: int = 5
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        ids, scores = self.index.search(query, self.k)
+        return [
+            Document(page_content=self.index.texts[i], metadata={"chunk_index": int(i), "bm25_score": float(score)})
+            for i, score in zip(ids, scores)
+        ]
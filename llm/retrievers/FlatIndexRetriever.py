@@ -0,0 +1,207 @@
+import os
+import json
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+EMBEDDINGS_FILE_NAME = "embeddings.npy"
+SCALES_FILE_NAME = "scales.npy"
+ORIGINALS_FILE_NAME = "embeddings_f16.npy" # optional float16 copy of int8-quantized vectors, read only for re-scoring
+CHUNKS_FILE_NAME = "chunks.json"
+SCAN_BLOCK_ROWS = 1024 # rows widened to float32 at a time, keeps the scratch block cache-resident
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector scalar quantization: vectors ~= codes * scales[:, None]."""
+    vectors = np.atleast_2d(vectors)
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+class FlatIndex:
+    """
+    Exact in-process vector index: the chunk embeddings of one asset as a single contiguous
+    matrix of unit vectors, so a search is one matrix-vector product.
+    Stored as embeddings.npy plus chunks.json with the chunk texts, in one of three formats:
+    float32, float16 (half the size) or int8 (scalar-quantized with per-vector scales in
+    scales.npy, a quarter of the size). Vectors stay in their stored dtype and are memory-mapped;
+    int8 indexes scan with an int8-quantized query and re-score the best rescore_factor * k candidates
+    with the float query against the dequantized vectors, which removes the query-side quantization
+    error only: int8 search is lossy. Saved with keep_originals, an int8 index also stores float16
+    originals (embeddings_f16.npy, memory-mapped and paged in only for the candidates) and re-scores
+    against them, trading 2 more bytes per dimension on disk for near-exact results.
+    """
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        texts: List[str],
+        metadatas: Optional[List[dict]] = None,
+        scales: Optional[np.ndarray] = None,
+        rescore_factor: int = 4,
+        originals: Optional[np.ndarray] = None
+    ):
+        self.embeddings = embeddings
+        self.scales = scales
+        self.originals = originals
+        self.texts = texts
+        self.metadatas = metadatas or [{} for _ in texts]
+        self.rescore_factor = rescore_factor
+
+    @classmethod
+    def save(
+        cls,
+        index_dir: str,
+        texts: List[str],
+        embeddings: Any,
+        metadatas: Optional[List[dict]] = None,
+        dtype: str = "float32",
+        keep_originals: bool = False
+    ):
+        os.makedirs(index_dir, exist_ok=True)
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1))
+        scales_path = os.path.join(index_dir, SCALES_FILE_NAME)
+        originals_path = os.path.join(index_dir, ORIGINALS_FILE_NAME)
+        stale_paths = [scales_path, originals_path]
+        if dtype == "int8":
+            if keep_originals:
+                np.save(originals_path, vectors.astype(np.float16))
+                stale_paths.remove(originals_path)
+            vectors, scales = quantize_int8(vectors)
+            np.save(scales_path, scales)
+            stale_paths.remove(scales_path)
+        else:
+            vectors = vectors.astype(dtype)
+        for path in stale_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        np.save(os.path.join(index_dir, EMBEDDINGS_FILE_NAME), vectors)
+        with open(os.path.join(index_dir, CHUNKS_FILE_NAME), "w", encoding="utf-8") as f:
+            json.dump({"texts": texts, "metadatas": metadatas or [{} for _ in texts]}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, index_dir: str, rescore_factor: int = 4) -> "FlatIndex":
+        embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE_NAME), mmap_mode="r")
+        scales, originals = None, None
+        if embeddings.dtype == np.int8:
+            scales = np.load(os.path.join(index_dir, SCALES_FILE_NAME))
+            originals_path = os.path.join(index_dir, ORIGINALS_FILE_NAME)
+            if os.path.exists(originals_path):
+                originals = np.load(originals_path, mmap_mode="r")
+        with open(os.path.join(index_dir, CHUNKS_FILE_NAME), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        return cls(embeddings, chunks["texts"], chunks["metadatas"], scales, rescore_factor, originals)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the scanned vectors (and int8 scales), without the float16 originals of int8 indexes."""
+        return self.embeddings.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def vectors(self, ids: np.ndarray) -> np.ndarray:
+        """float32 vectors of the given chunks: the float16 originals of int8 indexes that keep them, else the stored vectors dequantized."""
+        if self.originals is not None:
+            return np.asarray(self.originals[ids], dtype=np.float32)
+        vectors = np.asarray(self.embeddings[ids], dtype=np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[ids][:, None]
+        return vectors
+
+    def _prepare_query(self, query: Any):
+        """(normalized float query, scan query, scale of the scan scores); int8 indexes scan with quantized codes."""
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        if self.scales is None:
+            return query, query, None
+        query_codes, query_scale = quantize_int8(query)
+        return query, query_codes[0].astype(np.float32), query_scale[0] # int8 x int8 sums over <= 1024 dims are exact in float32
+
+    def _scan(self, start: int, end: int, scan_query: np.ndarray, query_scale) -> np.ndarray:
+        """Similarities of rows start..end to the prepared query, widened to float32 a block at a time."""
+        scores = np.empty(end - start, dtype=np.float32)
+        for block_start in range(start, end, SCAN_BLOCK_ROWS):
+            block = np.asarray(self.embeddings[block_start:min(block_start + SCAN_BLOCK_ROWS, end)], dtype=np.float32)
+            scores[block_start - start:block_start - start + len(block)] = block @ scan_query
+        if self.scales is not None:
+            scores *= self.scales[start:end] * query_scale
+        return scores
+
+    def similarities(self, query: Any) -> np.ndarray:
+        """Cosine similarity of the query to every chunk (approximate for int8 indexes)."""
+        _, scan_query, query_scale = self._prepare_query(query)
+        return self._scan(0, len(self.embeddings), scan_query, query_scale)
+
+    def search(self, query: Any, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k chunk ids and scores, best first."""
+        scores = self.similarities(query)
+        if self.scales is None:
+            top = _top_k(scores, k)
+            return top, scores[top]
+
+        candidates = _top_k(scores, k * self.rescore_factor)
+        exact = self.vectors(candidates) @ _normalize(np.asarray(query, dtype=np.float32))
+        top = _top_k(exact, k)
+        return candidates[top], exact[top]
+
+    def mmr(self, query: Any, k: int, fetch_k: int = 20, lambda_mult: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Maximal marginal relevance over the fetch_k nearest chunks. The candidate-to-candidate
+        similarities are one matrix product; each selection step is a vectorized argmax.
+        Returns the selected chunk ids (in selection order) and their query similarities.
+        """
+        candidates, relevance = self.search(query, max(fetch_k, k))
+        k = min(k, len(candidates))
+        if k <= 0:
+            return candidates, relevance
+
+        vectors = self.vectors(candidates)
+        pairwise = vectors @ vectors.T
+        redundancy = np.full(len(candidates), -np.inf, dtype=np.float32) # max similarity to the selected set
+        available = np.ones(len(candidates), dtype=bool)
+        selected = []
+        for _ in range(k):
+            scores = lambda_mult * relevance - (1 - lambda_mult) * np.where(np.isinf(redundancy), 0.0, redundancy)
+            choice = int(np.argmax(np.where(available, scores, -np.inf)))
+            selected.append(choice)
+            available[choice] = False
+            redundancy = np.maximum(redundancy, pairwise[:, choice])
+
+        selected = np.asarray(selected)
+        return candidates[selected], relevance[selected]
+
+class FlatIndexRetriever(BaseRetriever):
+    """LangChain retriever over a FlatIndex, supporting search_type "similarity" and "mmr"."""
+    index: Any
+    embedding: Any
+    search_type: str = "mmr"
+    k: int = 5
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        query_vector = self.embedding.embed_query(query)
+        if self.search_type == "mmr":
+            ids, scores = self.index.mmr(query_vector, self.k, self.fetch_k, self.lambda_mult)
+        else:
+            ids, scores = self.index.search(query_vector, self.k)
+
+        return [
+            Document(
+                page_content=self.index.texts[i],
+                metadata={**self.index.metadatas[i], "chunk_index": int(i), "score": float(score)}
+            )
+            for i, score in zip(ids, scores)
+        ]
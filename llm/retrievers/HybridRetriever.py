@@ -0,0 +1,43 @@
+from typing import Dict, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], rrf_k: int = 60) -> List[Document]:
+    """
+    Fuses ranked document lists by summing 1 / (rrf_k + rank) per list. Documents are identified
+    by their text, so the same chunk from different retrievers is merged; its metadata is combined
+    and the fused score is stored in metadata["score"].
+    """
+    fused: Dict[str, Document] = {}
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            if key in fused:
+                fused[key].metadata = {**doc.metadata, **fused[key].metadata}
+            else:
+                fused[key] = Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+
+    ordered = sorted(fused, key=scores.get, reverse=True)
+    for key in ordered:
+        fused[key].metadata["score"] = scores[key]
+    return [fused[key] for key in ordered]
+
+class HybridRetriever(BaseRetriever):
+    """
+    Combines retrievers (dense and BM25) with reciprocal rank fusion, so chunks matching exact terms
+    such as function names or theorem numbers surface even when their embeddings rank them low.
+    """
+    retrievers: List[BaseRetriever]
+    k: int = 5
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        rankings = [
+            retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+            for retriever in self.retrievers
+        ]
+        return reciprocal_rank_fusion(rankings, self.rrf_k)[:self.k]
@@ -0,0 +1,174 @@
+import os
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from .FlatIndexRetriever import FlatIndex, SCAN_BLOCK_ROWS, _normalize, _top_k
+
+CENTROIDS_FILE_NAME = "ivf_centroids.npy"
+OFFSETS_FILE_NAME = "ivf_offsets.npy"
+ROW_IDS_FILE_NAME = "ivf_row_ids.npy"
+IVF_FILE_NAMES = (CENTROIDS_FILE_NAME, OFFSETS_FILE_NAME, ROW_IDS_FILE_NAME)
+TRAIN_POINTS_PER_LIST = 64 # k-means trains on a sample of this many vectors per list
+TRAIN_ITERATIONS = 12
+
+def default_nlist(count: int) -> int:
+    """About 4 * sqrt(n) inverted lists, the usual IVF starting point."""
+    return max(1, min(count, int(4 * np.sqrt(count))))
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by inner product, all unit vectors) of every vector, computed in blocks."""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS * 8):
+        block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS * 8], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+def train_centroids(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the (unit) vectors; empty lists are re-seeded from the sample."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * TRAIN_POINTS_PER_LIST)
+    sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(TRAIN_ITERATIONS):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
+
+class IVFIndex(FlatIndex):
+    """
+    Approximate vector index for large assets: an inverted file over k-means lists.
+    The stored vectors are grouped by list, so each list is a contiguous slice of embeddings.npy
+    (any FlatIndex dtype; kept int8 originals are in the same order), with ivf_centroids.npy,
+    ivf_offsets.npy (list boundaries) and ivf_row_ids.npy (the chunk index of every row). All files are memory-mapped on load, so nothing
+    is rebuilt at startup. A search scans only the nprobe lists closest to the query: raising nprobe
+    trades latency for recall, up to exact search at nprobe = nlist.
+    Chunk ids in and out are the original chunk indexes, so the index is a drop-in FlatIndex.
+    """
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        texts: List[str],
+        metadatas: Optional[List[dict]],
+        scales: Optional[np.ndarray],
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        row_ids: np.ndarray,
+        rescore_factor: int = 4,
+        nprobe: int = 8,
+        originals: Optional[np.ndarray] = None
+    ):
+        super().__init__(embeddings, texts, metadatas, scales, rescore_factor, originals)
+        self.centroids = centroids
+        self.offsets = offsets
+        self.row_ids = row_ids
+        self.rows = np.empty(len(row_ids), dtype=np.int64) # chunk index -> row
+        self.rows[row_ids] = np.arange(len(row_ids))
+        self.nprobe = nprobe
+
+    @classmethod
+    def save(
+        cls,
+        index_dir: str,
+        texts: List[str],
+        embeddings: Any,
+        metadatas: Optional[List[dict]] = None,
+        dtype: str = "float32",
+        nlist: int = 0,
+        keep_originals: bool = False
+    ):
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1))
+        centroids = train_centroids(vectors, min(nlist or default_nlist(len(vectors)), len(vectors)))
+        assignments = _assign(vectors, centroids)
+        row_ids = np.argsort(assignments, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=len(centroids)))])
+
+        # FlatIndex.save writes the rows in list order; texts and metadatas stay in chunk order
+        super().save(index_dir, texts, vectors[row_ids], metadatas, dtype, keep_originals)
+        np.save(os.path.join(index_dir, CENTROIDS_FILE_NAME), centroids)
+        np.save(os.path.join(index_dir, OFFSETS_FILE_NAME), offsets.astype(np.int64))
+        np.save(os.path.join(index_dir, ROW_IDS_FILE_NAME), row_ids.astype(np.int64))
+
+    @classmethod
+    def load(cls, index_dir: str, rescore_factor: int = 4, nprobe: int = 8) -> "IVFIndex":
+        flat = FlatIndex.load(index_dir, rescore_factor)
+        return cls(
+            flat.embeddings, flat.texts, flat.metadatas, flat.scales,
+            np.load(os.path.join(index_dir, CENTROIDS_FILE_NAME)),
+            np.load(os.path.join(index_dir, OFFSETS_FILE_NAME)),
+            np.load(os.path.join(index_dir, ROW_IDS_FILE_NAME), mmap_mode="r"),
+            rescore_factor,
+            nprobe,
+            flat.originals
+        )
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def vectors(self, ids: np.ndarray) -> np.ndarray:
+        return super().vectors(self.rows[np.asarray(ids)])
+
+    def similarities(self, query: Any) -> np.ndarray:
+        """Exact similarities of every chunk, in chunk order."""
+        scores = np.empty(len(self.row_ids), dtype=np.float32)
+        scores[self.row_ids] = super().similarities(query)
+        return scores
+
+    def search(self, query: Any, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k chunk ids and scores, best first, from the nprobe nearest lists."""
+        query, scan_query, query_scale = self._prepare_query(query)
+        lists = _top_k(self.centroids @ query, min(self.nprobe, self.nlist))
+
+        candidate_rows, candidate_scores = [], []
+        for list_id in lists:
+            start, end = int(self.offsets[list_id]), int(self.offsets[list_id + 1])
+            if end > start:
+                candidate_rows.append(np.arange(start, end))
+                candidate_scores.append(self._scan(start, end, scan_query, query_scale))
+        if not candidate_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows, scores = np.concatenate(candidate_rows), np.concatenate(candidate_scores)
+
+        if self.scales is None:
+            top = _top_k(scores, k)
+            return self.row_ids[rows[top]], scores[top]
+
+        candidates = self.row_ids[rows[_top_k(scores, k * self.rescore_factor)]]
+        exact = self.vectors(candidates) @ query
+        top = _top_k(exact, k)
+        return candidates[top], exact[top]
+
+def save_vector_index(
+    index_dir: str,
+    texts: List[str],
+    embeddings: Any,
+    metadatas: Optional[List[dict]] = None,
+    dtype: str = "float32",
+    ann: str = "none",
+    min_vectors: int = 0,
+    nlist: int = 0,
+    keep_originals: bool = False
+):
+    """Writes an IVFIndex when ann is "ivf" and the asset has at least min_vectors chunks, a FlatIndex otherwise."""
+    if ann == "ivf" and len(texts) >= max(min_vectors, 1):
+        IVFIndex.save(index_dir, texts, embeddings, metadatas, dtype, nlist, keep_originals)
+        return
+    FlatIndex.save(index_dir, texts, embeddings, metadatas, dtype, keep_originals)
+    for file_name in IVF_FILE_NAMES:
+        path = os.path.join(index_dir, file_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+def load_vector_index(index_dir: str, rescore_factor: int = 4, nprobe: int = 8) -> FlatIndex:
+    """Opens the flat or IVF index stored in index_dir."""
+    if os.path.exists(os.path.join(index_dir, CENTROIDS_FILE_NAME)):
+        return IVFIndex.load(index_dir, rescore_factor, nprobe)
+    return FlatIndex.load(index_dir, rescore_factor)
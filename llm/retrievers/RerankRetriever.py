@@ -0,0 +1,43 @@
+import time
+from typing import Any, List
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.callbacks.manager import dispatch_custom_event
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+RERANK_EVENT = "rerank"
+
+class RerankRetriever(BaseRetriever):
+    """
+    Takes a wide candidate set from a cheap first-stage retriever, scores every candidate against the
+    query with a cross-encoder in one batched call and keeps the top k. The rerank score is stored in
+    metadata["rerank_score"]; the rerank latency of each query is dispatched as a RERANK_EVENT custom event.
+    """
+    retriever: BaseRetriever
+    reranker: Any # exposes score(query, texts) -> np.ndarray
+    k: int = 3
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        candidates = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        if not candidates:
+            return []
+
+        start = time.perf_counter()
+        scores = self.reranker.score(query, [doc.page_content for doc in candidates])
+        rerank_ms = (time.perf_counter() - start) * 1000
+
+        top = np.argsort(-scores, kind="stable")[:self.k]
+        documents = []
+        for i in top:
+            metadata = {**candidates[i].metadata, "rerank_score": float(scores[i])}
+            documents.append(Document(page_content=candidates[i].page_content, metadata=metadata))
+
+        print(f"Reranked {len(candidates)} candidates in {rerank_ms:.1f}ms")
+        dispatch_custom_event(
+            RERANK_EVENT,
+            {"candidates": len(candidates), "kept": len(documents), "rerank_ms": round(rerank_ms, 2)},
+            config={"callbacks": run_manager.get_child()}
+        )
+        return documents
@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+class ShardCache:
+    """
+    LRU of loaded per-asset retrievers (memory-mapped flat indexes, BM25 postings, Chroma handles).
+    Hot assets stay resident; beyond capacity the least recently used shard is dropped, which releases
+    its mappings once in-flight searches finish. An entry is reloaded when its index version changes.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._shards: "OrderedDict[Hashable, tuple]" = OrderedDict() # key -> (version, retriever)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: Hashable, version: Any, loader: Callable[[], Optional[BaseRetriever]]) -> Optional[BaseRetriever]:
+        with self._lock:
+            cached = self._shards.get(key)
+            if cached is not None and cached[0] == version:
+                self._shards.move_to_end(key)
+                self._stats["hits"] += 1
+                return cached[1]
+            self._stats["misses"] += 1
+
+        retriever = loader() # outside the lock, so a slow load does not block searches of other shards
+        if retriever is None:
+            return None
+        with self._lock:
+            self._shards[key] = (version, retriever)
+            self._shards.move_to_end(key)
+            while len(self._shards) > self.capacity:
+                self._shards.popitem(last=False)
+                self._stats["evictions"] += 1
+        return retriever
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "resident": len(self._shards), "capacity": self.capacity}
+
+class ShardedRetriever(BaseRetriever):
+    """
+    Searches the index of every asset of a course concurrently, one shard per asset, and merges the
+    results into a global top k by reciprocal rank fusion: shard scores are not comparable (cosine for
+    flat shards, RRF for hybrid ones, none for Chroma), so each result scores 1 / (rrf_k + its rank in
+    its shard). Each document is tagged with metadata["asset_id"]; the shard's own score is kept in
+    metadata["shard_score"].
+    Shards are resolved through load_shard (usually backed by a ShardCache) inside the worker threads,
+    so cold shards load in parallel as well.
+    """
+    asset_ids: List[str]
+    load_shard: Callable[[str], Optional[BaseRetriever]]
+    executor: Any # concurrent.futures.Executor
+    k: int = 5
+    rrf_k: int = 60
+
+    def _search_shard(self, asset_id: str, query: str, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        shard = self.load_shard(asset_id)
+        if shard is None:
+            return []
+        docs = shard.invoke(query, config={"callbacks": run_manager.get_child()})
+        return [
+            Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "asset_id": asset_id, "shard_score": doc.metadata.get("score"), "score": 1.0 / (self.rrf_k + rank)}
+            )
+            for rank, doc in enumerate(docs, start=1)
+        ]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        futures = [self.executor.submit(self._search_shard, asset_id, query, run_manager) for asset_id in self.asset_ids]
+        merged = [doc for future in futures for doc in future.result()]
+        merged.sort(key=lambda doc: doc.metadata["score"], reverse=True) # stable: equal ranks keep the asset order
+        return merged[:self.k]
+
+shard_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_shard_executor(workers: int) -> ThreadPoolExecutor:
+    """Process-wide pool for shard searches."""
+    global shard_executor
+    with _executor_lock:
+        if shard_executor is None:
+            shard_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard-search")
+    return shard_executor
@@ -1,16 +1,40 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, APIRouter
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from routes import file_processing_routes
 from routes import question_gen_routes
 from routes import summarizer_routes
 from routes import qa_routes
+from routes import metrics_routes
+from helper import get_settings
+from llm import EmbeddingProviderFactory
+from tools.transcript_tool import transcription_pool
+from tools.vector_index_tool import get_reranker
+from controllers.IngestionJobController import ingestion_manager
 from dotenv import load_dotenv
 
 load_dotenv() 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    if settings.EMBEDDING_PRELOAD: # warm the shared embedding model before the first request
+        await run_in_threadpool(EmbeddingProviderFactory(settings).preload)
+        if settings.RERANK_ENABLED:
+            await run_in_threadpool(get_reranker)
+    if settings.TRANSCRIPTION_PRELOAD:
+        transcription_pool.start()
+    await ingestion_manager.start() # also resumes jobs left unfinished by a previous run
+    yield
+    await ingestion_manager.stop()
+    transcription_pool.shutdown()
+
 app = FastAPI(
     title="CourseTA API",
     version="1.0.0",
-    description="API for CourseTA agentic system including preprocessing and graph-based agents."
+    description="API for CourseTA agentic system including preprocessing and graph-based agents.",
+    lifespan=lifespan
 )
 
 # Add CORS middleware to allow requests from Gradio frontend
@@ -58,6 +82,13 @@ graph_base_router.include_router(
 )
 
 api_v1_router.include_router(graph_base_router)
+
+# --- Metrics Routes --- #
+api_v1_router.include_router(
+    metrics_routes.router,
+    prefix="/metrics",
+    tags=["Metrics"]
+)
 app.include_router(api_v1_router)
 
 
@@ -1,99 +1,316 @@
-import shutil
+import hashlib
 import uuid
 import os
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from tools.pdf_extractor_tool import extract_text_from_pdf, save_extracted_text
-from tools.transcript_tool import transcript_loader
+import json
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from fastapi import APIRouter, File, UploadFile, HTTPException, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, Response
+from helper import get_settings
+from controllers.IngestionJobController import ingestion_manager, UPLOADS_DIR
+from tools.vector_index_tool import ASSETS_BASE_PATH
+from tools.text_index_tool import TEXT_FILE_NAME, load_text_index, read_byte_range, snap_byte_range, unit_byte_range, unit_label
 
 router = APIRouter()
-ASSETS_DIR = "assets"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MEDIA_EXTENSIONS = [".mp3", ".mp4", ".wav", ".avi", ".mov", ".mkv", ".flv"]
+
+config = get_settings()
+
+def _file_kind(file: UploadFile) -> str:
+    """Returns 'pdf' or 'media', raising a 400 for unsupported uploads."""
+    content_type = file.content_type.lower() if file.content_type else ""
+    file_ext = os.path.splitext(file.filename)[1].lower()
+
+    print(f"Processing file: {file.filename}, Content-Type: {content_type}, Extension: {file_ext}")
+
+    if content_type == "application/pdf" or file_ext == ".pdf":
+        return "pdf"
+    if content_type.startswith("audio/") or content_type.startswith("video/") or file_ext in MEDIA_EXTENSIONS:
+        return "media"
+    raise HTTPException(
+        status_code=400, 
+        detail=f"Unsupported file type: {content_type or file_ext}. Only PDF, audio, or video files are allowed."
+    )
+
+def _save_upload(file: UploadFile):
+    """
+    Streams the upload to a temporary file while hashing it. Blocking: handlers run it in the threadpool.
+    Returns (upload_path, content_hash).
+    """
+    upload_path = os.path.join(UPLOADS_DIR, f"{uuid.uuid4()}.part")
+    content_hash = hashlib.sha256()
+    try:
+        with open(upload_path, "wb") as buffer:
+            while chunk := file.file.read(UPLOAD_CHUNK_SIZE):
+                content_hash.update(chunk)
+                buffer.write(chunk)
+    except Exception:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+        raise
+    return upload_path, content_hash.hexdigest()
+
+def _upload_response(job: dict, deduplicated: bool) -> dict:
+    asset_dir = os.path.dirname(job["file_path"])
+    return {
+        "message": "File already processed" if deduplicated else "File uploaded, processing queued",
+        "id": job["asset_id"],
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "deduplicated": deduplicated,
+        "text_path": os.path.join(asset_dir, "extracted_text.txt"),
+        "original_file_path": job["file_path"]
+    }
+
+def _sse(event: dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
 
 @router.post("/upload_file/")
 async def upload_file_api(file: UploadFile = File(...)):
     """
-    Handles both PDF and audio/video file uploads, extracts text or transcription,
-    and saves both in the 'assets' directory organized by a unique ID.
+    Handles both PDF and audio/video file uploads. The file is saved in the 'assets' directory
+    under a unique ID and text extraction/transcription and indexing are queued as a background job.
+    Poll /jobs/{job_id} or stream /jobs/{job_id}/stream for progress.
     """
     print(f"Received file upload: {file.filename}")
     if not file:
         raise HTTPException(status_code=400, detail="No file uploaded.")
 
-    file_id = str(uuid.uuid4())
-    file_dir = os.path.join(ASSETS_DIR, file_id)
-    os.makedirs(file_dir, exist_ok=True)
-
-    file_path = os.path.join(file_dir, file.filename)
-    text_path = os.path.join(file_dir, "extracted_text.txt")
-    
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        content_type = file.content_type.lower() if file.content_type else ""
-        file_ext = os.path.splitext(file.filename)[1].lower()
-        
-        print(f"Processing file: {file.filename}, Content-Type: {content_type}, Extension: {file_ext}")
-        
-        # Process based on file type
-        if content_type == "application/pdf" or file_ext == ".pdf":
-            print(f"Processing as PDF: {file_path}")
-            extracted_documents = extract_text_from_pdf(file_path)
-            save_extracted_text(extracted_documents, text_path)
-            print("PDF text extraction complete")
-
-        elif (content_type.startswith("audio/") or 
-              content_type.startswith("video/") or 
-              file_ext in [".mp3", ".mp4", ".wav", ".avi", ".mov", ".mkv", ".flv"]):
-            print(f"Processing as audio/video: {file_path}")
-            transcription = transcript_loader(file_path)
-            with open(text_path, "w", encoding="utf-8") as f:
-                f.write(transcription)
-            print("Audio/Video transcription complete")
-
-        else:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Unsupported file type: {content_type or file_ext}. Only PDF, audio, or video files are allowed."
-            )
-
-        return {
-            "message": "File processed successfully",
-            "id": file_id,
-            "text_path": text_path,
-            "original_file_path": file_path
-        }
-        
+        file_kind = _file_kind(file)
+        upload_path, content_hash = await run_in_threadpool(_save_upload, file)
+        job, deduplicated = ingestion_manager.submit_upload(upload_path, file.filename, content_hash, file_kind)
+        return _upload_response(job, deduplicated)
+
+    except HTTPException:
+        raise
+
     except Exception as e:
-        if os.path.exists(file_dir): # Clean up the directory if an error occurs
-            shutil.rmtree(file_dir)
-        error_msg = f"An error occurred during file processing: {str(e)}"
+        error_msg = f"An error occurred during file upload: {str(e)}"
         print(f"ERROR: {error_msg}")
         raise HTTPException(status_code=500, detail=error_msg)
     
     finally:
         file.file.close()
 
-@router.get("/get_extracted_text/{asset_id}")
-async def get_extracted_text(asset_id: str):
+@router.post("/upload_file_streaming/")
+async def upload_file_streaming_api(file: UploadFile = File(...)):
     """
-    Retrieve the extracted text for a given asset ID.
+    Same as /upload_file/ but streams the ingestion job progress as server-sent events.
+    Audio/video is transcribed in overlapping windows in parallel and every window's
+    transcript is sent as a 'partial_transcript' event as soon as it completes.
     """
+    print(f"Received streaming file upload: {file.filename}")
+    try:
+        file_kind = _file_kind(file)
+        upload_path, content_hash = await run_in_threadpool(_save_upload, file)
+    finally:
+        file.file.close()
+
+    job, deduplicated = ingestion_manager.submit_upload(upload_path, file.filename, content_hash, file_kind, chunked=True)
+    events = ingestion_manager.subscribe(job["job_id"]) # before the job can start, so no event is missed
+
+    async def generate():
+        yield _sse({"type": "metadata", "id": job["asset_id"], "job_id": job["job_id"], "deduplicated": deduplicated})
+        async for event in ingestion_manager.stream(job["job_id"], events):
+            yield _sse(event)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+def _resolve_asset_dir(asset_id: str) -> str:
+    """Directory of an asset that can take a new job: it exists and has no unfinished job."""
+    asset_dir = os.path.join(ASSETS_BASE_PATH, asset_id.strip())
+    if not asset_id.strip() or not os.path.exists(os.path.join(asset_dir, "asset.json")):
+        raise HTTPException(status_code=404, detail=f"Asset not found: {asset_id}")
+    active = ingestion_manager.active_job(asset_id)
+    if active is not None:
+        raise HTTPException(status_code=409, detail=f"Asset {asset_id} is still being processed by job {active['job_id']}")
+    return asset_dir
+
+@router.post("/reextract/{asset_id}")
+async def reextract_asset_api(asset_id: str):
+    """
+    Re-extracts an asset's files with the current extractor and updates its index incrementally:
+    only chunks whose text changed are embedded, chunks that disappeared are deleted.
+    """
+    _resolve_asset_dir(asset_id)
+    job = ingestion_manager.submit_reextract(asset_id)
+    return {"message": "Re-extraction queued", "id": asset_id, "job_id": job["job_id"], "status": job["status"]}
+
+@router.post("/append_file/{asset_id}")
+async def append_file_api(asset_id: str, file: UploadFile = File(...)):
+    """
+    Appends the text of another file (e.g. the next lecture of a series) to an existing asset of the
+    same kind (PDF pages or audio/video segments) and indexes only the new chunks.
+    Poll /jobs/{job_id} or stream /jobs/{job_id}/stream for progress.
+    """
+    try:
+        asset_dir = _resolve_asset_dir(asset_id)
+        file_kind = _file_kind(file)
+        text_index = load_text_index(asset_dir)
+        if text_index is None:
+            raise HTTPException(status_code=400, detail=f"Asset {asset_id} has no page index, re-extract it before appending.")
+        if text_index["unit"] != ("page" if file_kind == "pdf" else "segment"):
+            raise HTTPException(status_code=400, detail=f"Asset {asset_id} is indexed by {text_index['unit']}s, cannot append a {file_kind} file.")
+        upload_path, _ = await run_in_threadpool(_save_upload, file)
+    finally:
+        file.file.close()
+
+    job = ingestion_manager.submit_append(asset_id, upload_path, file.filename, file_kind)
+    return {"message": "File uploaded, appending queued", "id": asset_id, "job_id": job["job_id"], "status": job["status"]}
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Returns the status, stage and progress of an ingestion job.
+    """
+    job = ingestion_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return {key: value for key, value in job.items() if key != "file_path"}
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job_progress(job_id: str):
+    """
+    Streams ingestion job progress as server-sent events until the job completes or fails.
+    """
+    if ingestion_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    async def generate():
+        async for event in ingestion_manager.stream(job_id):
+            yield _sse(event)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+def _text_validators(text_path: str):
+    """ETag and Last-Modified of the extracted text, derived from its size and modification time."""
+    stat = os.stat(text_path)
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    return etag, formatdate(stat.st_mtime, usegmt=True), stat
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= int(parsedate_to_datetime(if_modified_since).timestamp())
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _resolve_text_path(asset_id: str) -> str:
     if not asset_id.strip():
         raise HTTPException(status_code=400, detail="Asset ID is required.")
     
-    text_path = os.path.join(ASSETS_DIR, asset_id.strip(), "extracted_text.txt")
+    text_path = os.path.join(ASSETS_BASE_PATH, asset_id.strip(), TEXT_FILE_NAME)
     
     if not os.path.exists(text_path):
         raise HTTPException(status_code=404, detail=f"Extracted text not found for asset ID: {asset_id}")
-    
+    return text_path
+
+@router.get("/get_extracted_text/{asset_id}")
+async def get_extracted_text(
+    request: Request,
+    asset_id: str,
+    start_byte: Optional[int] = Query(None, ge=0),
+    end_byte: Optional[int] = Query(None, ge=0),
+    start_page: Optional[int] = Query(None, ge=1),
+    end_page: Optional[int] = Query(None, ge=1),
+    max_bytes: Optional[int] = Query(None, ge=1)
+):
+    """
+    Retrieve the extracted text for a given asset ID, the whole text unless a range is given.
+    Select pages (PDF pages, or transcript segments for audio/video; 1-based, inclusive) with
+    start_page/end_page, or bytes with start_byte/end_byte (end exclusive). max_bytes caps a byte
+    range to pages of that size; follow next_start_byte for the rest.
+    Byte ranges are moved onto UTF-8 character boundaries; start_byte/end_byte report the range returned.
+    Use /get_extracted_text/{asset_id}/raw for the whole file.
+    """
+    text_path = _resolve_text_path(asset_id)
+    asset_dir = os.path.dirname(text_path)
+    etag, last_modified, stat = _text_validators(text_path)
+    headers = {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": "no-cache"}
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    total_bytes = stat.st_size
+    response = {"asset_id": asset_id, "total_bytes": total_bytes}
+
+    if start_page is not None or end_page is not None:
+        text_index = load_text_index(asset_dir)
+        if text_index is None:
+            raise HTTPException(status_code=400, detail=f"No page index for asset ID: {asset_id}. Use a byte range instead.")
+        if text_index["count"] == 0:
+            raise HTTPException(status_code=416, detail="The asset has no pages.")
+
+        first = (start_page or 1) - 1
+        last = min((end_page or text_index["count"]), text_index["count"]) - 1
+        if first > last:
+            raise HTTPException(status_code=416, detail=f"Page range out of bounds, the asset has {text_index['count']} pages.")
+
+        start_byte, end_byte = unit_byte_range(text_index, first, last)
+        response.update({
+            "unit": text_index["unit"],
+            "start_page": first + 1,
+            "end_page": last + 1,
+            "total_pages": text_index["count"],
+            "pages": [unit_label(text_index, i) for i in range(first, last + 1)]
+        })
+    else:
+        start_byte = start_byte or 0
+        end_byte = min(end_byte if end_byte is not None else total_bytes, total_bytes)
+        if max_bytes is not None:
+            end_byte = min(end_byte, start_byte + max_bytes)
+
+    if start_byte > total_bytes or start_byte > end_byte:
+        raise HTTPException(status_code=416, detail=f"Byte range out of bounds, the text has {total_bytes} bytes.")
+
     try:
-        with open(text_path, "r", encoding="utf-8") as f:
-            extracted_text = f.read()
-        
-        return {
-            "asset_id": asset_id,
-            "extracted_text": extracted_text
-        }
-        
+        # byte ranges are snapped to character boundaries and the returned range says where it really starts and ends
+        start_byte, end_byte = await run_in_threadpool(snap_byte_range, asset_dir, start_byte, end_byte)
+        extracted_text = await run_in_threadpool(read_byte_range, asset_dir, start_byte, end_byte)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading extracted text: {str(e)}")
+
+    response.update({
+        "extracted_text": extracted_text,
+        "start_byte": start_byte,
+        "end_byte": end_byte,
+        "next_start_byte": end_byte if end_byte < total_bytes else None
+    })
+    return JSONResponse(response, headers=headers)
+
+@router.get("/get_extracted_text/{asset_id}/raw")
+async def get_extracted_text_raw(request: Request, asset_id: str):
+    """
+    Streams the whole extracted text file as text/plain straight from disk.
+    Supports conditional requests (ETag/Last-Modified) and HTTP Range requests.
+    """
+    text_path = _resolve_text_path(asset_id)
+    etag, last_modified, stat = _text_validators(text_path)
+    headers = {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": "no-cache"}
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(text_path, media_type="text/plain; charset=utf-8", headers=headers, stat_result=stat)
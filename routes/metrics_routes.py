@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+
+from llm.EmbeddingModelRegistry import embedding_model_registry
+from llm.QueryEmbeddingBatcher import query_batcher_stats
+from tools.vector_index_tool import shard_cache
+
+router = APIRouter()
+
+@router.get("/embedding_models")
+async def get_embedding_model_stats():
+    """
+    Lists the embedding models resident in this process with their load time and memory footprint.
+    """
+    return {"models": embedding_model_registry.stats()}
+
+@router.get("/query_embedding_batches")
+async def get_query_embedding_batch_stats():
+    """
+    Queue depth and batch-size distribution of the query embedding micro-batchers.
+    """
+    return {"batchers": query_batcher_stats()}
+
+@router.get("/retriever_shards")
+async def get_retriever_shard_stats():
+    """
+    Hits, misses, evictions and residency of the per-asset retriever shard LRU.
+    """
+    return {"shards": shard_cache.stats()}
@@ -4,16 +4,44 @@ import json
 from fastapi import APIRouter, HTTPException, Body
 from fastapi.responses import StreamingResponse
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Optional, Union
 
 from controllers.GraphState import QuestionAnswerState
 from controllers.QuestionAnswerGraphController import stream_qa_graph as qa_graph
+from controllers.QuestionAnswerGraphController import BUFFERED_ANSWER_TAG, ANSWER_TOKEN_EVENT
+from controllers.IngestionJobController import ingestion_manager
+from llm.retrievers.RerankRetriever import RERANK_EVENT
 
 router = APIRouter()
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 ASSETS_BASE_PATH = os.path.join(PROJECT_ROOT, "assets")
 
+def token_from_event(event: Dict[str, Any]) -> Union[str, None]:
+    """
+    Answer text carried by a graph stream event, if any. Tokens of speculative and single-call answers
+    arrive as custom events once the question is known to be on-topic, so their raw model stream is skipped.
+    """
+    if event["event"] == "on_chat_model_stream":
+        if BUFFERED_ANSWER_TAG not in event.get("tags", []) and event["data"]["chunk"].content:
+            return event["data"]["chunk"].content
+    elif event["event"] == "on_custom_event" and event["name"] == ANSWER_TOKEN_EVENT:
+        return event["data"]["content"]
+    return None
+
+def rerank_from_event(event: Dict[str, Any]) -> Union[Dict[str, Any], None]:
+    """Candidate count and latency of the cross-encoder rerank of this request, if the event reports one."""
+    if event["event"] == "on_custom_event" and event["name"] == RERANK_EVENT:
+        return event["data"]
+    return None
+
+def ensure_not_ingesting(asset_ids: List[str]):
+    """409 while an asset is still being extracted or indexed: its text and index are incomplete."""
+    for asset_id in asset_ids:
+        active = ingestion_manager.active_job(asset_id)
+        if active is not None:
+            raise HTTPException(status_code=409, detail=f"Asset {asset_id} is still being processed by job {active['job_id']}")
+
 def serialize_message(message: BaseMessage) -> Dict[str, Any]:
     msg_dict = {"type": message.type, "content": message.content}
     if hasattr(message, 'additional_kwargs'):
@@ -24,41 +52,49 @@ def serialize_message(message: BaseMessage) -> Dict[str, Any]:
 
 
 @router.post("/start_session_stream")
-async def start_qa_session_stream(asset_id: str = Body(..., embed=True), initial_question: str = Body(..., embed=True)):
+async def start_qa_session_stream(
+    initial_question: str = Body(..., embed=True),
+    asset_id: Optional[str] = Body(None, embed=True),
+    asset_ids: Optional[List[str]] = Body(None, embed=True)
+):
     """
-    Starts a new question answering session with streaming response
+    Starts a new question answering session with streaming response.
+    Pass asset_id for a single asset, or asset_ids to ask across all assets of a course.
     """
     thread_id = str(uuid.uuid4())
-    context_file_path = os.path.join(ASSETS_BASE_PATH, asset_id, "extracted_text.txt")
-
-    if not os.path.exists(context_file_path):
-        raise HTTPException(status_code=404, detail=f"Asset text file not found for id: {asset_id}")
+    asset_ids = list(dict.fromkeys(asset_ids or ([asset_id] if asset_id else [])))
+    if not asset_ids:
+        raise HTTPException(status_code=400, detail="Provide asset_id or asset_ids.")
 
-    try:
-        with open(context_file_path, "r", encoding="utf-8") as f:
-            context = f.read()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to read context file: {str(e)}")
+    for course_asset_id in asset_ids:
+        context_file_path = os.path.join(ASSETS_BASE_PATH, course_asset_id, "extracted_text.txt")
+        if not os.path.exists(context_file_path):
+            raise HTTPException(status_code=404, detail=f"Asset text file not found for id: {course_asset_id}")
+    ensure_not_ingesting(asset_ids)
 
     initial_state = QuestionAnswerState(
         messages=[HumanMessage(content=initial_question)],
         relevant_text=[],
         on_topic="",
-        context=context,
+        asset_id=asset_ids[0],
+        asset_ids=asset_ids,
         conversation_history=[]
     )
 
     config = {"configurable": {"thread_id": thread_id}}
     
     async def generate():
-        yield f"data: {json.dumps({'type': 'metadata', 'thread_id': thread_id, 'asset_id': asset_id})}\n\n"
+        yield f"data: {json.dumps({'type': 'metadata', 'thread_id': thread_id, 'asset_id': asset_ids[0], 'asset_ids': asset_ids})}\n\n"
         
         async for event in qa_graph.astream_events(initial_state, config=config, version="v2"):
             # print(f"Received chunk: {event}\n\n\n\n")
 
-            if event["event"] == "on_chat_model_stream" and event["data"]["chunk"].content:
-                # print(f"Streaming event: {event}")
-                yield f"data: {json.dumps({'type': 'token', 'content': event['data']['chunk'].content})}\n\n"
+            token = token_from_event(event)
+            rerank = rerank_from_event(event)
+            if token:
+                yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
+            elif rerank:
+                yield f"data: {json.dumps({'type': 'rerank', **rerank})}\n\n"
             elif event["event"] == "on_chain_stream" and event.get("name", "") == "off_topic_response":
                 messages = event["data"]["chunk"]["messages"]
                 if messages and isinstance(messages[-1], AIMessage):
@@ -96,6 +132,7 @@ async def continue_qa_conversation_stream(
             raise HTTPException(status_code=404, detail=f"Session (thread_id: {thread_id}) not found or state is empty. Start a new session.")
 
         current_graph_state_dict = current_graph_state_dict.values
+        ensure_not_ingesting(current_graph_state_dict.get("asset_ids") or [current_graph_state_dict.get("asset_id")])
         previous_messages_raw = current_graph_state_dict.get("messages", [])
         previous_messages: List[BaseMessage] = []
         for msg_data in previous_messages_raw:
@@ -119,9 +156,12 @@ async def continue_qa_conversation_stream(
             async for event in qa_graph.astream_events(payload_for_graph, config=config, version="v2"):
                 # print(f"Received chunk: {event}\n\n\n\n")
 
-                if event["event"] == "on_chat_model_stream" and event["data"]["chunk"].content:
-                    # print(f"Streaming event: {event}")
-                    yield f"data: {json.dumps({'type': 'token', 'content': event['data']['chunk'].content})}\n\n"
+                token = token_from_event(event)
+                rerank = rerank_from_event(event)
+                if token:
+                    yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
+                elif rerank:
+                    yield f"data: {json.dumps({'type': 'rerank', **rerank})}\n\n"
                 elif event["event"] == "on_chain_stream" and  event.get("name", "") == "off_topic_response":
                     yield f"data: {json.dumps({'type': 'token', 'content': event['data']['chunk']['messages'][-1].content})}\n\n"
             yield f"data: {json.dumps({'type': 'complete'})}\n\n"
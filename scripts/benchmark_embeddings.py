@@ -0,0 +1,75 @@
+"""
+Embedding throughput benchmark: encodes the same chunks with each embedding provider and reports
+texts/second plus the agreement between their vectors.
+
+    python scripts/benchmark_embeddings.py --asset-id <id>
+    python scripts/benchmark_embeddings.py --num-texts 2000 --repeat 3
+
+Chunks come from an asset's extracted text when --asset-id is given, otherwise synthetic text.
+The embedding cache is disabled so every run measures real forward passes.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import random
+import argparse
+
+import numpy as np
+
+from helper import get_settings, text_splitter
+from llm import EmbeddingProviderFactory
+from llm.Enums import EmbeddingEnums
+from tools.vector_index_tool import get_asset_dir
+
+WORDS = ("lecture gradient descent matrix probability theorem network layer student course exam "
+         "example definition proof function variable data model training error loss").split()
+
+def load_chunks(asset_id: str, num_texts: int):
+    config = get_settings()
+    if asset_id:
+        with open(os.path.join(get_asset_dir(asset_id), "extracted_text.txt"), "r", encoding="utf-8") as f:
+            return text_splitter(f.read(), chunk_size=config.CHUNK_SIZE, chunk_overlap=config.CHUNK_OVERLAP)[:num_texts]
+    rng = random.Random(0)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 70))) for _ in range(num_texts)]
+
+def benchmark(embedding, texts, repeat: int):
+    embedding.embed_documents(texts[:8]) # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        vectors = embedding.embed_documents(texts)
+        timings.append(time.perf_counter() - start)
+    return np.asarray(vectors, dtype=np.float32), min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--asset-id", default=None)
+    parser.add_argument("--num-texts", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--model-id", default=None)
+    args = parser.parse_args()
+
+    config = get_settings()
+    config.EMBEDDING_CACHE_ENABLED = False
+    model_id = args.model_id or config.EMBEDDING_MODEL_ID
+    if "/" not in model_id:
+        model_id = f"sentence-transformers/{model_id}"
+    texts = load_chunks(args.asset_id, args.num_texts)
+    print(f"{len(texts)} texts, model {model_id}, device {config.EMBEDDING_DEVICE}, batch size {config.EMBEDDING_BATCH_SIZE}")
+
+    factory = EmbeddingProviderFactory(config)
+    results = {}
+    for provider in (EmbeddingEnums.LOCAL_EMBEDDING.value, EmbeddingEnums.HUGGINGFACE.value):
+        embedding = factory.create(provider, model_id, config.EMBEDDING_DEVICE)
+        vectors, seconds = benchmark(embedding, texts, args.repeat)
+        results[provider] = vectors
+        print(f"{provider:>16}: {len(texts) / seconds:8.1f} texts/s ({seconds:.2f}s best of {args.repeat})")
+
+    local, hf = results[EmbeddingEnums.LOCAL_EMBEDDING.value], results[EmbeddingEnums.HUGGINGFACE.value]
+    cosine = np.sum(local * hf, axis=1) / (np.linalg.norm(local, axis=1) * np.linalg.norm(hf, axis=1))
+    print(f"cosine(local, huggingface): mean {cosine.mean():.5f}, min {cosine.min():.5f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compares the streaming QA graph modes (two_stage, speculative, single_call) on labeled questions:
+time to first token, total latency, model calls per question and on/off-topic accuracy.
+
+    python scripts/benchmark_qa_modes.py labeled_questions.jsonl --modes two_stage single_call
+
+Each input line is {"asset_id": "...", "question": "...", "on_topic": true|false}.
+Every question is a fresh session and runs against the configured LLM providers, so this costs real calls.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import uuid
+import asyncio
+import argparse
+
+import numpy as np
+from langchain_core.messages import HumanMessage
+
+from controllers.QuestionAnswerGraphController import build_stream_qa_graph
+from langgraph.checkpoint.memory import MemorySaver
+from routes.qa_routes import token_from_event
+
+MODES = ("two_stage", "speculative", "single_call")
+
+async def run_question(graph, example: dict) -> dict:
+    state = {
+        "messages": [HumanMessage(content=example["question"])],
+        "relevant_text": [],
+        "on_topic": "",
+        "asset_id": example["asset_id"],
+        "conversation_history": [],
+    }
+    run_config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    start = time.perf_counter()
+    first_token = None
+    model_calls = 0
+    async for event in graph.astream_events(state, config=run_config, version="v2"):
+        if event["event"] == "on_chat_model_start":
+            model_calls += 1
+        elif first_token is None and (
+            token_from_event(event) or (event["event"] == "on_chain_stream" and event.get("name") == "off_topic_response")
+        ):
+            first_token = time.perf_counter() - start
+
+    on_topic = graph.get_state(run_config).values["on_topic"].lower() == "yes"
+    return {
+        "ttft": first_token if first_token is not None else time.perf_counter() - start,
+        "total": time.perf_counter() - start,
+        "model_calls": model_calls,
+        "correct": on_topic == bool(example["on_topic"]),
+        "labeled_on_topic": bool(example["on_topic"]),
+    }
+
+def summarize(mode: str, results: list):
+    ttft = np.asarray([r["ttft"] for r in results])
+    total = np.asarray([r["total"] for r in results])
+    on_topic = [r for r in results if r["labeled_on_topic"]]
+    off_topic = [r for r in results if not r["labeled_on_topic"]]
+    print(f"{mode:>12}: ttft p50 {np.percentile(ttft, 50):.2f}s p90 {np.percentile(ttft, 90):.2f}s | "
+          f"total p50 {np.percentile(total, 50):.2f}s | "
+          f"calls/question {np.mean([r['model_calls'] for r in results]):.2f} | "
+          f"accuracy {np.mean([r['correct'] for r in results]):.1%} "
+          f"(on-topic answered {np.mean([r['correct'] for r in on_topic]) if on_topic else float('nan'):.1%}, "
+          f"off-topic refused {np.mean([r['correct'] for r in off_topic]) if off_topic else float('nan'):.1%})")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("labeled_questions")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    with open(args.labeled_questions, "r", encoding="utf-8") as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+    print(f"{len(examples)} questions")
+
+    for mode in args.modes:
+        graph = build_stream_qa_graph(mode, MemorySaver())
+        results = [await run_question(graph, example) for example in examples]
+        summarize(mode, results)
+
+if __name__ == "__main__":
+    asyncio.run(main())
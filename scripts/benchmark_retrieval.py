@@ -0,0 +1,115 @@
+"""
+Retrieval benchmark for the flat index storage formats and the IVF index: recall@k against exact
+float32 search, disk and scanned bytes per index and query latency (p50/p99).
+
+    python scripts/benchmark_retrieval.py --asset-id <id> --queries questions.txt
+    python scripts/benchmark_retrieval.py --num-vectors 200000 --dim 384 --clusters 500 --nprobe 1 4 8 16
+
+With --asset-id the asset's chunks are embedded with the configured model and the queries are
+read from --queries (one question per line) or, without it, taken from the chunks themselves.
+Without --asset-id random unit vectors are used, which is a worst case for quantization and,
+without --clusters, for IVF (real embeddings are clustered by topic). The IVF index is built once
+with --ivf-dtype storage and --nlist lists (0 = default) and searched with each --nprobe value.
+The int8+f16 row is int8 with FLAT_INDEX_INT8_KEEP_ORIGINALS. "disk MB" counts every .npy file of
+an index, including scales, float16 originals and IVF lists; "scanned MB" only the vectors a scan reads.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+from llm.retrievers.FlatIndexRetriever import FlatIndex
+from llm.retrievers.IVFIndex import IVFIndex
+
+def load_vectors(args):
+    if not args.asset_id:
+        rng = np.random.default_rng(0)
+        corpus = rng.normal(size=(args.num_vectors, args.dim)).astype(np.float32)
+        if args.clusters:
+            centers = rng.normal(size=(args.clusters, args.dim)) * 2
+            corpus += centers[rng.integers(args.clusters, size=args.num_vectors)].astype(np.float32)
+        queries = corpus[rng.choice(len(corpus), args.num_queries)] + rng.normal(scale=0.5, size=(args.num_queries, args.dim))
+        return [str(i) for i in range(len(corpus))], corpus, queries.astype(np.float32)
+
+    from helper import get_settings
+    from benchmark_embeddings import load_chunks
+    from tools.vector_index_tool import _get_embedding
+
+    get_settings().EMBEDDING_CACHE_ENABLED = True
+    embedding = _get_embedding()
+    texts = load_chunks(args.asset_id, sys.maxsize)
+    corpus = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = texts[:args.num_queries]
+    queries = np.asarray([embedding.embed_query(q) for q in questions], dtype=np.float32)
+    return texts, corpus, queries
+
+def directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.endswith(".npy"))
+
+def evaluate(index, queries, truth, k):
+    recalls, latencies = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        ids, _ = index.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len(set(ids.tolist()) & set(expected.tolist())) / len(expected))
+    return float(np.mean(recalls)), np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--asset-id", default=None)
+    parser.add_argument("--queries", default=None)
+    parser.add_argument("--num-vectors", type=int, default=20000)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--clusters", type=int, default=0, help="synthetic corpus drawn around this many centers")
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="*", default=[1, 4, 8, 16])
+    parser.add_argument("--ivf-dtype", default="float32", choices=["float32", "float16", "int8"])
+    parser.add_argument("--ivf-keep-originals", action="store_true", help="int8 IVF index with float16 originals")
+    args = parser.parse_args()
+
+    texts, corpus, queries = load_vectors(args)
+    print(f"{len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        results = {}
+        for name, dtype, keep_originals in (("float32", "float32", False), ("float16", "float16", False), ("int8", "int8", False), ("int8+f16", "int8", True)):
+            index_dir = os.path.join(work_dir, name)
+            FlatIndex.save(index_dir, texts, corpus, dtype=dtype, keep_originals=keep_originals)
+            results[name] = (FlatIndex.load(index_dir, args.rescore_factor), directory_bytes(index_dir))
+
+        if args.nprobe:
+            index_dir = os.path.join(work_dir, "ivf")
+            start = time.perf_counter()
+            IVFIndex.save(index_dir, texts, corpus, dtype=args.ivf_dtype, nlist=args.nlist, keep_originals=args.ivf_keep_originals)
+            build_seconds = time.perf_counter() - start
+            for nprobe in args.nprobe:
+                index = IVFIndex.load(index_dir, args.rescore_factor, nprobe)
+                results[f"ivf/{nprobe}"] = (index, directory_bytes(index_dir))
+            print(f"IVF index ({args.ivf_dtype}, {index.nlist} lists) built in {build_seconds:.1f}s; rows below are ivf/<nprobe>")
+
+        exact = results["float32"][0]
+        truth = [exact.search(query, args.k)[0] for query in queries]
+        print(f"{'index':>8} {'disk MB':>9} {'scanned MB':>11} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for dtype, (index, disk_bytes) in results.items():
+            recall, p50, p99 = evaluate(index, queries, truth, args.k)
+            print(f"{dtype:>8} {disk_bytes / 2**20:9.2f} {index.nbytes / 2**20:11.2f} {recall:9.4f} {p50:8.3f} {p99:8.3f}")
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    main()
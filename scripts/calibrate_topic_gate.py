@@ -0,0 +1,74 @@
+"""
+Calibrates TOPIC_GATE_LOW / TOPIC_GATE_HIGH from labeled questions.
+
+    python scripts/calibrate_topic_gate.py labeled_questions.jsonl --max-error 0.02
+
+Each input line is {"asset_id": "...", "question": "...", "on_topic": true|false}; the assets must
+have been indexed (topic_profile.json present). LOW is set so that at most max-error of the on-topic
+questions fall below it, HIGH so that at most max-error of the off-topic questions reach it.
+The report shows how many questions each setting decides locally and the local error rates.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import argparse
+
+import numpy as np
+
+from tools.vector_index_tool import get_asset_dir, get_query_embedding
+from tools.topic_profile_tool import load_topic_profile, topic_score
+
+def load_scores(path: str):
+    embedding = get_query_embedding()
+    scores, labels, missing = [], [], set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            example = json.loads(line)
+            profile = load_topic_profile(get_asset_dir(example["asset_id"]))
+            if profile is None:
+                missing.add(example["asset_id"])
+                continue
+            scores.append(topic_score(profile, embedding.embed_query(example["question"])))
+            labels.append(bool(example["on_topic"]))
+    if missing:
+        print(f"Skipped questions of {len(missing)} assets without a topic profile: {sorted(missing)}")
+    return np.asarray(scores), np.asarray(labels)
+
+def report(scores, labels, low: float, high: float):
+    decided_yes, decided_no = scores >= high, scores < low
+    local = decided_yes | decided_no
+    false_yes = np.sum(decided_yes & ~labels)
+    false_no = np.sum(decided_no & labels)
+    print(f"  low={low:.4f} high={high:.4f}: {local.mean():.1%} decided locally "
+          f"({decided_yes.sum()} yes, {decided_no.sum()} no), "
+          f"{false_no} on-topic rejected, {false_yes} off-topic accepted, {np.sum(~local)} sent to the grader")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("labeled_questions")
+    parser.add_argument("--max-error", type=float, default=0.02)
+    args = parser.parse_args()
+
+    scores, labels = load_scores(args.labeled_questions)
+    if labels.all() or not labels.any():
+        sys.exit("Need both on-topic and off-topic examples to calibrate.")
+
+    on_topic, off_topic = scores[labels], scores[~labels]
+    print(f"{len(scores)} questions: on-topic scores p5/p50/p95 = {np.percentile(on_topic, [5, 50, 95]).round(3)}, "
+          f"off-topic = {np.percentile(off_topic, [5, 50, 95]).round(3)}")
+
+    low = float(np.quantile(on_topic, args.max_error))
+    high = float(np.quantile(off_topic, 1 - args.max_error))
+    if low > high: # the classes separate cleanly; keep the band empty in the middle
+        low = high = (low + high) / 2
+
+    print("Calibrated:")
+    report(scores, labels, low, high)
+    print(f"\nTOPIC_GATE_LOW={low:.4f}\nTOPIC_GATE_HIGH={high:.4f}")
+
+if __name__ == "__main__":
+    main()
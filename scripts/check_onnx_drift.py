@@ -0,0 +1,70 @@
+"""
+Accuracy drift of the quantized ONNX embedding backend against the float PyTorch model.
+Encodes the same chunks with both backends of LocalEmbeddingProvider and reports the cosine
+similarity between paired vectors, the top-k retrieval overlap and the speedup.
+Exits with status 1 when the mean cosine falls below --min-cosine.
+
+    python scripts/check_onnx_drift.py --asset-id <id>
+    python scripts/check_onnx_drift.py --onnx-file-name onnx/model_qint8_avx512.onnx
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import argparse
+
+import numpy as np
+
+from helper import get_settings
+from llm.providers.LocalEmbeddingProvider import LocalEmbeddingProvider
+from benchmark_embeddings import load_chunks
+
+def encode(embedding, texts):
+    embedding.embed_documents(texts[:8]) # warm up
+    start = time.perf_counter()
+    vectors = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+    return vectors, time.perf_counter() - start
+
+def topk_overlap(reference: np.ndarray, candidate: np.ndarray, queries: int, k: int) -> float:
+    """Mean overlap of the top-k neighbours of the first `queries` chunks, searched within each backend."""
+    overlaps = []
+    for i in range(min(queries, len(reference))):
+        ref_top = set(np.argsort(-(reference @ reference[i]))[:k])
+        cand_top = set(np.argsort(-(candidate @ candidate[i]))[:k])
+        overlaps.append(len(ref_top & cand_top) / k)
+    return float(np.mean(overlaps))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--asset-id", default=None)
+    parser.add_argument("--num-texts", type=int, default=500)
+    parser.add_argument("--onnx-file-name", default=None)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    args = parser.parse_args()
+
+    config = get_settings()
+    onnx_file_name = args.onnx_file_name or config.EMBEDDING_ONNX_FILE_NAME
+    texts = load_chunks(args.asset_id, args.num_texts)
+
+    float_model = LocalEmbeddingProvider(model_id=config.EMBEDDING_MODEL_ID, device="cpu", backend="torch")
+    onnx_model = LocalEmbeddingProvider(model_id=config.EMBEDDING_MODEL_ID, device="cpu", backend="onnx", onnx_file_name=onnx_file_name)
+
+    reference, float_seconds = encode(float_model, texts)
+    candidate, onnx_seconds = encode(onnx_model, texts)
+
+    cosine = np.sum(reference * candidate, axis=1) # both backends output unit vectors
+    print(f"{len(texts)} texts, model {float_model.model_id}, onnx file {onnx_file_name}")
+    print(f"torch: {len(texts) / float_seconds:8.1f} texts/s")
+    print(f"onnx : {len(texts) / onnx_seconds:8.1f} texts/s ({float_seconds / onnx_seconds:.2f}x)")
+    print(f"cosine(torch, onnx): mean {cosine.mean():.5f}, min {cosine.min():.5f}, p5 {np.percentile(cosine, 5):.5f}")
+    print(f"top-{args.k} neighbour overlap: {topk_overlap(reference, candidate, 100, args.k):.3f}")
+
+    if cosine.mean() < args.min_cosine:
+        print(f"FAIL: mean cosine below {args.min_cosine}")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import os
+import json
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from tools.text_index_tool import read_byte_range
+
+PARENT_SPANS_FILE_NAME = "parent_spans.json"
+CHARS_PER_TOKEN = 4 # rough estimate for English text, good enough for a context budget
+
+_spans: Dict[str, Tuple[float, dict]] = {} # asset_dir -> (mtime, parent spans)
+_spans_lock = threading.Lock()
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def save_parent_spans(asset_dir: str, spans: List[Tuple[int, int]], chunk_parents: List[int], chunk_ids: List[str]):
+    """
+    Writes parent_spans.json for an asset: the (start, end) byte offsets of each parent span in
+    extracted_text.txt and the parent id of each indexed child chunk, by chunk index and chunk id.
+    """
+    path = os.path.join(asset_dir, PARENT_SPANS_FILE_NAME)
+    data = {"spans": [list(span) for span in spans], "chunk_parents": list(chunk_parents), "chunk_ids": list(chunk_ids)}
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(f"{path}.tmp", path)
+
+def remove_parent_spans(asset_dir: str):
+    path = os.path.join(asset_dir, PARENT_SPANS_FILE_NAME)
+    if os.path.exists(path):
+        os.remove(path)
+
+def load_parent_spans(asset_dir: str) -> Optional[dict]:
+    """The asset's parent spans (cached in memory until the file changes), or None when it has none."""
+    path = os.path.join(asset_dir, PARENT_SPANS_FILE_NAME)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _spans_lock:
+        cached = _spans.get(asset_dir)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "r", encoding="utf-8") as f:
+        spans = json.load(f)
+    spans["parent_by_id"] = dict(zip(spans.get("chunk_ids", []), spans["chunk_parents"]))
+    with _spans_lock:
+        _spans[asset_dir] = (mtime, spans)
+    return spans
+
+def _parent_id(doc: Document, spans: dict) -> Optional[int]:
+    """Chunk ids are stable across incremental reindexing; chunk indexes match rebuilt indexes (flat, BM25)."""
+    chunk_id = doc.metadata.get("chunk_id")
+    if chunk_id in spans["parent_by_id"]:
+        return spans["parent_by_id"][chunk_id]
+    chunk_parents = spans["chunk_parents"]
+    chunk_index = doc.metadata.get("chunk_index")
+    if chunk_index is not None and 0 <= int(chunk_index) < len(chunk_parents):
+        return chunk_parents[int(chunk_index)]
+    return None
+
+def expand_to_parents(documents: List[Document], max_tokens: int, asset_dir_of: Callable[[Document], str]) -> List[Document]:
+    """
+    Replaces retrieved child chunks by their parent spans, in rank order, each parent once.
+    asset_dir_of gives the asset directory of a chunk, so results of several assets can be mixed.
+    Parents are added while they fit in max_tokens; a child whose parent does not fit is kept as is
+    when the child fits. The best-ranked chunk (or its parent) is always kept. Chunks of assets
+    without parent spans are kept as they are.
+    """
+    context, seen, used = [], set(), 0
+    for doc in documents:
+        asset_dir = asset_dir_of(doc)
+        spans = load_parent_spans(asset_dir)
+        parent_id = _parent_id(doc, spans) if spans is not None else None
+        if parent_id is not None and (asset_dir, parent_id) in seen:
+            continue
+
+        candidate = doc
+        if parent_id is not None:
+            start, end = spans["spans"][parent_id]
+            text = read_byte_range(asset_dir, start, end)
+            candidate = Document(page_content=text, metadata={**doc.metadata, "parent_id": parent_id})
+            if used + estimate_tokens(text) > max_tokens:
+                candidate = doc
+
+        tokens = estimate_tokens(candidate.page_content)
+        if context and used + tokens > max_tokens:
+            continue
+        if candidate is not doc:
+            seen.add((asset_dir, parent_id))
+        context.append(candidate)
+        used += tokens
+    return context
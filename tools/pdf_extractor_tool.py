@@ -1,16 +1,91 @@
-from langchain_community.document_loaders import PyMuPDFLoader
-import os
-from typing import List
-from langchain.schema import Document
-
-def extract_text_from_pdf(pdf_path: str) -> List[Document]:
-    """Extracts text from a PDF file using PyMuPDFLoader. """
-    loader = PyMuPDFLoader(pdf_path)
-    documents = loader.load()
-    return documents
-
-def save_extracted_text(documents: List[Document], output_path: str):
-    """Saves the extracted text to a file."""
-    with open(output_path, "w", encoding="utf-8") as f:
-        for doc in documents:
-            f.write(doc.page_content)
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, List, Optional
+import fitz
+
+from helper import get_settings
+
+EXTRACTOR_VERSION = "pymupdf-2" # bump when the extracted text changes, so deduplicated uploads are re-extracted
+
+config = get_settings()
+
+_pool: ProcessPoolExecutor = None
+_pool_lock = threading.Lock()
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[str]:
+    """Runs in a worker process: text of pages [start, end)."""
+    with fitz.open(pdf_path) as doc:
+        return [doc[i].get_text() for i in range(start, end)]
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=config.PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+def extract_pdf_to_file(
+    pdf_path: str,
+    output_path: str,
+    pages_per_task: int = None,
+    on_progress: Optional[Callable[[int, int], None]] = None
+) -> List[dict]:
+    """
+    Extracts the text of the PDF at pdf_path page by page and streams it to output_path in page order, never holding the whole document in memory.
+    Documents longer than one task are split into page ranges extracted in parallel by a process pool.
+    Workers open the PDF by path, so the document itself is never sent to them.
+    Returns per-page byte offsets into the output file: [{"page", "start", "end"}] (pages are 1-based),
+    ready for text_index_tool.save_text_index.
+    """
+    pages_per_task = pages_per_task or config.PDF_PAGES_PER_TASK
+    offsets = []
+    written = 0
+
+    with open(output_path, "wb") as f: # binary, so offsets are exact UTF-8 byte positions
+
+        def write_page(page_number: int, text: str):
+            nonlocal written
+            data = text.encode("utf-8")
+            f.write(data)
+            offsets.append({"page": page_number, "start": written, "end": written + len(data)})
+            written += len(data)
+
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+            if page_count <= pages_per_task or config.PDF_EXTRACT_WORKERS <= 1:
+                for i in range(page_count):
+                    write_page(i + 1, doc[i].get_text())
+                    if on_progress:
+                        on_progress(i + 1, page_count)
+                return offsets
+
+        ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+        max_in_flight = config.PDF_EXTRACT_WORKERS * 2 # bounds the finished-but-unwritten ranges held in memory
+        pool = _get_pool()
+        pending = {}
+        finished = {}
+        next_submit = next_write = 0
+
+        while next_write < len(ranges):
+            while next_submit < len(ranges) and next_submit - next_write < max_in_flight:
+                start, end = ranges[next_submit]
+                pending[pool.submit(_extract_page_range, pdf_path, start, end)] = next_submit
+                next_submit += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                finished[pending.pop(future)] = future.result()
+
+            while next_write in finished:
+                start, end = ranges[next_write]
+                for i, text in enumerate(finished.pop(next_write)):
+                    write_page(start + i + 1, text)
+                next_write += 1
+                if on_progress:
+                    on_progress(end, page_count)
+
+    return offsets
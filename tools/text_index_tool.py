@@ -0,0 +1,174 @@
+import os
+import json
+import zlib
+import shutil
+from typing import List, Optional, Tuple
+
+TEXT_FILE_NAME = "extracted_text.txt"
+TEXT_INDEX_FILE_NAME = "extracted_text.index.json"
+TEXT_INDEX_VERSION = 1
+BLOCK_BOUNDARY_MODULUS = 4 # about one short unit in four ends a chunking block
+APPEND_SEPARATOR = b"\n\n"
+
+def write_segments_text(segments: List[dict], text_path: str) -> List[dict]:
+    """
+    Writes transcript segments to the extracted text file one after another and
+    returns their byte ranges: [{"start", "end", "time": [start_seconds, end_seconds]}].
+    """
+    units = []
+    written = 0
+    with open(text_path, "wb") as f:
+        for i, segment in enumerate(segments):
+            text = segment["text"].lstrip() if i == 0 else segment["text"]
+            data = text.encode("utf-8")
+            f.write(data)
+            units.append({"start": written, "end": written + len(data), "time": [segment["start"], segment["end"]]})
+            written += len(data)
+    return units
+
+def save_text_index(asset_dir: str, unit: str, units: List[dict]):
+    """
+    Writes the compact sidecar next to extracted_text.txt: parallel arrays of byte offsets plus
+    page numbers (unit="page") or [start, end] timestamps in seconds (unit="segment").
+    """
+    index = {
+        "version": TEXT_INDEX_VERSION,
+        "unit": unit,
+        "count": len(units),
+        "size": units[-1]["end"] if units else 0,
+        "starts": [u["start"] for u in units],
+        "ends": [u["end"] for u in units],
+    }
+    if unit == "page":
+        index["pages"] = [u["page"] for u in units]
+    else:
+        index["times"] = [u["time"] for u in units]
+
+    path = os.path.join(asset_dir, TEXT_INDEX_FILE_NAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(f"{path}.tmp", path)
+
+def load_text_index(asset_dir: str) -> Optional[dict]:
+    """Returns the sidecar of an asset, or None for assets extracted before it existed."""
+    path = os.path.join(asset_dir, TEXT_INDEX_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def unit_label(index: dict, i: int) -> dict:
+    """Metadata of the i-th page/segment, e.g. {"page": 3} or {"start_time": 12.0, "end_time": 15.5}."""
+    if index["unit"] == "page":
+        return {"page": index["pages"][i]}
+    start_time, end_time = index["times"][i]
+    return {"start_time": start_time, "end_time": end_time}
+
+def _is_continuation(f, offset: int) -> bool:
+    """Whether the byte at offset is inside a multi-byte UTF-8 character (0b10xxxxxx)."""
+    f.seek(offset)
+    byte = f.read(1)
+    return bool(byte) and byte[0] & 0xC0 == 0x80
+
+def snap_byte_range(asset_dir: str, start: int, end: int) -> Tuple[int, int]:
+    """
+    Moves start forward and end backward onto UTF-8 character boundaries of extracted_text.txt, so the
+    range decodes without losing bytes. A range inside a single character is widened to that character.
+    """
+    with open(os.path.join(asset_dir, TEXT_FILE_NAME), "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        start, end = min(start, size), min(end, size)
+        while start < size and _is_continuation(f, start):
+            start += 1
+        snapped_end = end
+        while snapped_end > start and _is_continuation(f, snapped_end):
+            snapped_end -= 1
+        if snapped_end <= start < end: # keep a non-empty range non-empty
+            snapped_end = start + 1
+            while snapped_end < size and _is_continuation(f, snapped_end):
+                snapped_end += 1
+    return start, snapped_end
+
+def read_byte_range(asset_dir: str, start: int, end: int) -> str:
+    """
+    Reads extracted_text.txt[start:end] by seeking, without loading the rest of the file.
+    The range must lie on character boundaries (page, segment and parent spans do; see snap_byte_range).
+    """
+    with open(os.path.join(asset_dir, TEXT_FILE_NAME), "rb") as f:
+        f.seek(start)
+        data = f.read(max(end - start, 0))
+    return data.decode("utf-8")
+
+def unit_byte_range(index: dict, first: int, last: int) -> Tuple[int, int]:
+    """Byte range covering pages/segments first..last (0-based, inclusive)."""
+    return index["starts"][first], index["ends"][last]
+
+def unit_blocks(index: dict, data: bytes, min_bytes: int, max_bytes: int) -> List[Tuple[int, int]]:
+    """
+    Groups consecutive pages/segments into byte ranges that chunking never crosses.
+    A block ends after a unit of at least min_bytes (a typical page is its own block), after a unit
+    whose content hash marks a boundary once the block has min_bytes (runs of short transcript
+    segments), or at max_bytes. Boundaries depend only on nearby content, so an edit or an appended
+    unit changes the blocks around it and leaves the others as they were.
+    """
+    blocks = []
+    block_start = None
+    for i in range(index["count"]):
+        start, end = index["starts"][i], index["ends"][i]
+        if block_start is None:
+            block_start = start
+        unit_size, block_size = end - start, end - block_start
+        if unit_size >= min_bytes \
+                or (block_size >= min_bytes and zlib.crc32(data[start:end]) % BLOCK_BOUNDARY_MODULUS == 0) \
+                or block_size >= max_bytes:
+            blocks.append((block_start, end))
+            block_start = None
+    if block_start is not None:
+        blocks.append((block_start, index["ends"][-1]))
+    return blocks
+
+def truncate_text(asset_dir: str, size: int, count: int):
+    """Cuts the asset's extracted text back to its first size bytes and the sidecar to its first count units."""
+    index = load_text_index(asset_dir)
+    unit = index["unit"]
+    units = [
+        {"start": s, "end": e, **({"page": index["pages"][i]} if unit == "page" else {"time": index["times"][i]})}
+        for i, (s, e) in enumerate(zip(index["starts"][:count], index["ends"][:count]))
+    ]
+    with open(os.path.join(asset_dir, TEXT_FILE_NAME), "r+b") as f:
+        f.truncate(size)
+    save_text_index(asset_dir, unit, units)
+
+def append_text(asset_dir: str, extra_text_path: str, unit: str, units: List[dict]):
+    """
+    Appends a newly extracted text file (and its pages/segments) to the asset's extracted text and
+    sidecar, after a blank line. Page numbers continue after the asset's last page; segment
+    timestamps are kept as they are, relative to the appended recording.
+    """
+    index = load_text_index(asset_dir)
+    if index is None:
+        raise ValueError("The asset has no page/segment index, re-extract it before appending")
+    if index["unit"] != unit:
+        raise ValueError(f"Cannot append {unit}s to an asset indexed by {index['unit']}s")
+
+    text_path = os.path.join(asset_dir, TEXT_FILE_NAME)
+    offset = os.path.getsize(text_path) + len(APPEND_SEPARATOR)
+    existing = [
+        {"start": s, "end": e, **({"page": index["pages"][i]} if unit == "page" else {"time": index["times"][i]})}
+        for i, (s, e) in enumerate(zip(index["starts"], index["ends"]))
+    ]
+    last_page = existing[-1]["page"] if unit == "page" and existing else 0
+    appended = [
+        {**u, "start": u["start"] + offset, "end": u["end"] + offset, **({"page": u["page"] + last_page} if unit == "page" else {})}
+        for u in units
+    ]
+
+    with open(f"{text_path}.tmp", "wb") as out:
+        with open(text_path, "rb") as f:
+            shutil.copyfileobj(f, out)
+        out.write(APPEND_SEPARATOR)
+        with open(extra_text_path, "rb") as f:
+            shutil.copyfileobj(f, out)
+    os.replace(f"{text_path}.tmp", text_path)
+    save_text_index(asset_dir, unit, existing + appended)
+    os.remove(extra_text_path)
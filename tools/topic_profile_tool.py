@@ -0,0 +1,80 @@
+import os
+import json
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+TOPIC_PROFILE_FILE_NAME = "topic_profile.json"
+PROFILE_PERCENTILES = (5, 25, 50, 75, 95)
+
+_profiles: Dict[str, Tuple[float, dict]] = {} # asset_dir -> (mtime, profile with the centroid as an array)
+_profiles_lock = threading.Lock()
+
+def build_topic_profile(asset_dir: str, embeddings: Any) -> Optional[dict]:
+    """
+    Writes topic_profile.json for an asset: the normalized centroid of its chunk embeddings and
+    percentiles of the chunk-to-centroid cosine similarities, which describe how tight the topic is.
+    """
+    path = os.path.join(asset_dir, TOPIC_PROFILE_FILE_NAME)
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectors.ndim != 2 or len(vectors) == 0:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    centroid = vectors.mean(axis=0)
+    centroid /= max(float(np.linalg.norm(centroid)), 1e-12)
+    similarities = vectors @ centroid
+
+    profile = {
+        "count": len(vectors),
+        "centroid": centroid.tolist(),
+        "similarity_percentiles": {str(p): float(np.percentile(similarities, p)) for p in PROFILE_PERCENTILES},
+    }
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(profile, f, separators=(",", ":"))
+    os.replace(f"{path}.tmp", path)
+    return profile
+
+def load_topic_profile(asset_dir: str) -> Optional[dict]:
+    """The asset's topic profile (cached in memory until the file changes), or None when it has none."""
+    path = os.path.join(asset_dir, TOPIC_PROFILE_FILE_NAME)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _profiles_lock:
+        cached = _profiles.get(asset_dir)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "r", encoding="utf-8") as f:
+        profile = json.load(f)
+    profile["centroid"] = np.asarray(profile["centroid"], dtype=np.float32)
+    with _profiles_lock:
+        _profiles[asset_dir] = (mtime, profile)
+    return profile
+
+def topic_score(profile: dict, query_vector: Any) -> float:
+    """
+    Cosine similarity of the question to the asset centroid, relative to the median similarity of the
+    asset's own chunks. 1.0 means "as central as a typical chunk"; the scale is comparable across assets.
+    """
+    query = np.asarray(query_vector, dtype=np.float32)
+    similarity = float(query @ profile["centroid"]) / max(float(np.linalg.norm(query)), 1e-12)
+    return similarity / max(profile["similarity_percentiles"]["50"], 1e-6)
+
+def topic_gate(profile: dict, query_vector: Any, low: float, high: float) -> Tuple[Optional[str], float]:
+    """
+    Decides clear cases locally: ("yes", score) at or above high, ("no", score) below low and
+    (None, score) in the ambiguous band that still needs the grader LLM.
+    """
+    score = topic_score(profile, query_vector)
+    if score >= high:
+        return "yes", score
+    if score < low:
+        return "no", score
+    return None, score
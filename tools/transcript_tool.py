@@ -1,13 +1,189 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import AsyncIterator, List, Tuple
+
 import whisper
 
-def transcript_loader(audio_path):
-    """Transcribes a local audio/video file using OpenAI Whisper."""
-    model = whisper.load_model("tiny")
+from helper import get_settings
+
+config = get_settings()
+
+SAMPLE_RATE = whisper.audio.SAMPLE_RATE
+EXTRACTOR_VERSION = f"whisper-{config.WHISPER_MODEL_SIZE}-1" # bump when the transcript output changes
+
+_worker_model = None # loaded once per worker process by _init_worker
+
+class TranscriptionQueueFull(RuntimeError):
+    """Raised when every worker is busy and the bounded job queue is full."""
+
+def _init_worker(model_size: str):
+    global _worker_model
+    _worker_model = whisper.load_model(model_size)
+
+def _ping() -> bool:
+    return _worker_model is not None
+
+def _segments(result: dict, offset: float = 0.0) -> List[dict]:
+    return [
+        {"start": round(seg["start"] + offset, 2), "end": round(seg["end"] + offset, 2), "text": seg["text"]}
+        for seg in result.get("segments", [])
+    ]
+
+def _transcribe(audio_path: str) -> dict:
+    result = _worker_model.transcribe(audio_path)
+    return {"text": result["text"], "segments": _segments(result)}
+
+def _transcribe_window(audio, offset: float) -> List[dict]:
+    result = _worker_model.transcribe(audio)
+    return _segments(result, offset)
+
+def split_windows(duration: float, window_seconds: float, overlap_seconds: float) -> List[Tuple[float, float]]:
+    """Overlapping (start, end) windows in seconds that cover the whole duration."""
+    if window_seconds <= 0 or duration <= window_seconds:
+        return [(0.0, duration)]
+    step = max(window_seconds - overlap_seconds, 1.0)
+    windows = []
+    start = 0.0
+    while start < duration:
+        end = min(start + window_seconds, duration)
+        windows.append((start, end))
+        if end >= duration:
+            break
+        start += step
+    return windows
+
+def _window_own_range(start: float, end: float, duration: float, overlap_seconds: float) -> Tuple[float, float]:
+    """Part of a window whose segments it keeps; overlaps are split in half between neighbours."""
+    own_start = 0.0 if start <= 0 else start + overlap_seconds / 2
+    own_end = duration if end >= duration else end - overlap_seconds / 2
+    return own_start, own_end
+
+def stitch_windows(windows: List[dict]) -> dict:
+    """Joins window results back in time order into a single transcript with segment timestamps."""
+    segments = []
+    for window in sorted(windows, key=lambda w: w["index"]):
+        segments.extend(window["segments"])
+    return {"text": "".join(seg["text"] for seg in segments).strip(), "segments": segments}
+
+class TranscriptionWorkerPool:
+    """
+    Pool of worker processes that each keep a Whisper model resident.
+    At most `workers` jobs run at once and at most `queue_size` more wait for a worker.
+    """
+    def __init__(self, model_size: str = "tiny", workers: int = 1, queue_size: int = 8):
+        self.model_size = model_size
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor: ProcessPoolExecutor = None
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"), # torch is not fork safe
+                    initializer=_init_worker,
+                    initargs=(self.model_size,)
+                )
+            return self._executor
+
+    def _acquire_slot(self):
+        if not self._slots.acquire(blocking=False):
+            raise TranscriptionQueueFull(
+                f"Transcription queue is full ({self.workers} running, {self.queue_size} queued). Try again later."
+            )
+
+    def start(self):
+        """Spawns the workers so their models are loaded before the first upload."""
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(_ping)
+
+    def submit(self, audio_path: str) -> Future:
+        """Queues a whole-file transcription job; the future resolves to {"text", "segments"}."""
+        self._acquire_slot()
+        try:
+            future = self._get_executor().submit(_transcribe, audio_path)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def submit_windows(self, audio_path: str, window_seconds: float, overlap_seconds: float) -> List[Tuple[dict, Future]]:
+        """
+        Decodes the media once and queues one job per overlapping time window.
+        The windows of a file count as a single job against the queue bound.
+        Returns (window info, future of the window's kept segments) pairs.
+        """
+        self._acquire_slot()
+        try:
+            audio = whisper.load_audio(audio_path)
+            duration = len(audio) / SAMPLE_RATE
+            executor = self._get_executor()
+            jobs = []
+            windows = split_windows(duration, window_seconds, overlap_seconds)
+            for index, (start, end) in enumerate(windows):
+                own_start, own_end = _window_own_range(start, end, duration, overlap_seconds)
+                samples = audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+                future = executor.submit(_transcribe_window, samples, start)
+                jobs.append(({"index": index, "count": len(windows), "start": own_start, "end": own_end}, future))
+        except Exception:
+            self._slots.release()
+            raise
+
+        remaining = [len(jobs)]
+        remaining_lock = threading.Lock()
+        def _release(_):
+            with remaining_lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    self._slots.release()
+        for _, future in jobs:
+            future.add_done_callback(_release)
+        return jobs
+
+    async def transcribe(self, audio_path: str) -> dict:
+        """Transcribes in a worker process without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(audio_path))
+
+    async def transcribe_windows(
+        self,
+        audio_path: str,
+        window_seconds: float = None,
+        overlap_seconds: float = None
+    ) -> AsyncIterator[dict]:
+        """
+        Transcribes overlapping windows in parallel and yields each window as soon as it completes
+        (not necessarily in order) as {"index", "count", "start", "end", "text", "segments"}.
+        Pass the collected windows to stitch_windows for the ordered transcript.
+        """
+        window_seconds = config.TRANSCRIPTION_WINDOW_SECONDS if window_seconds is None else window_seconds
+        overlap_seconds = config.TRANSCRIPTION_WINDOW_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds
+
+        jobs = await asyncio.to_thread(self.submit_windows, audio_path, window_seconds, overlap_seconds)
+        pending = {asyncio.wrap_future(future): window for window, future in jobs}
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield _window_result(pending.pop(task), task.result())
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
 
-    try:
-        result = model.transcribe(audio_path)
-        transcription = result["text"]
-    except Exception as e:
-        return f"Error transcribing audio: {str(e)}"
+def _window_result(window: dict, segments: List[dict]) -> dict:
+    kept = [seg for seg in segments if window["start"] <= seg["start"] < window["end"]]
+    return {**window, "text": "".join(seg["text"] for seg in kept).strip(), "segments": kept}
 
-    return transcription
+transcription_pool = TranscriptionWorkerPool(
+    model_size=config.WHISPER_MODEL_SIZE,
+    workers=config.TRANSCRIPTION_WORKERS,
+    queue_size=config.TRANSCRIPTION_QUEUE_SIZE
+)
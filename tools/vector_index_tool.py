@@ -0,0 +1,393 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+from langchain_community.vectorstores import Chroma
+from langchain_core.retrievers import BaseRetriever
+
+from helper import get_settings, split_with_parents
+from llm import EmbeddingProviderFactory
+from llm.QueryEmbeddingBatcher import BatchedQueryEmbeddings, get_query_batcher
+from llm.retrievers.FlatIndexRetriever import FlatIndexRetriever
+from llm.retrievers.IVFIndex import save_vector_index, load_vector_index
+from llm.retrievers.BM25Retriever import BM25Index, BM25Retriever
+from llm.retrievers.HybridRetriever import HybridRetriever
+from llm.retrievers.RerankRetriever import RerankRetriever
+from llm.retrievers.ShardedRetriever import ShardCache, ShardedRetriever, get_shard_executor
+from llm.providers.CrossEncoderReranker import CrossEncoderReranker
+from tools.topic_profile_tool import build_topic_profile
+from tools.parent_chunk_tool import save_parent_spans, remove_parent_spans
+from tools.text_index_tool import TEXT_FILE_NAME, load_text_index, unit_blocks
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS_BASE_PATH = os.path.join(PROJECT_ROOT, "assets")
+INDEX_DIR_NAME = "vector_index"
+FLAT_INDEX_DIR_NAME = "flat_index"
+KEYWORD_INDEX_DIR_NAME = "keyword_index"
+COLLECTION_NAME = "extracted_text"
+CHUNK_MANIFEST_FILE_NAME = "chunk_manifest.json"
+BLOCK_MAX_CHUNKS = 8 # chunking blocks of short units are closed at this many CHUNK_SIZEs
+CHROMA_ADD_BATCH_SIZE = 1000 # below Chroma's maximum batch size
+
+config = get_settings()
+shard_cache = ShardCache(config.RETRIEVER_SHARD_CACHE_SIZE)
+_ingesting: dict = {} # asset_id -> running ingestion jobs, maintained by the ingestion job manager
+_ingesting_lock = threading.Lock()
+
+def get_asset_dir(asset_id: str) -> str:
+    return os.path.join(ASSETS_BASE_PATH, asset_id)
+
+def get_index_dir(asset_id: str) -> str:
+    """Index directory of the configured RETRIEVER_BACKEND, so switching backends reindexes lazily."""
+    dir_name = FLAT_INDEX_DIR_NAME if config.RETRIEVER_BACKEND == "numpy" else INDEX_DIR_NAME
+    return os.path.join(get_asset_dir(asset_id), dir_name)
+
+def set_ingesting(asset_id: str, active: bool):
+    """Marks an ingestion job of the asset as started or finished; its text and index are not final meanwhile."""
+    with _ingesting_lock:
+        count = _ingesting.get(asset_id, 0) + (1 if active else -1)
+        if count > 0:
+            _ingesting[asset_id] = count
+        else:
+            _ingesting.pop(asset_id, None)
+
+def is_ingesting(asset_id: str) -> bool:
+    with _ingesting_lock:
+        return asset_id in _ingesting
+
+def get_keyword_index_dir(asset_id: str) -> str:
+    return os.path.join(get_asset_dir(asset_id), KEYWORD_INDEX_DIR_NAME)
+
+def _get_embedding():
+    return EmbeddingProviderFactory(config).create(
+        config.EMBEDDING_MODEL_PROVIDER,
+        config.EMBEDDING_MODEL_ID,
+        config.EMBEDDING_DEVICE
+    )
+
+def get_query_embedding():
+    """Embedding for retrieval queries; concurrent queries are micro-batched when EMBEDDING_QUERY_BATCHING is on."""
+    embedding = _get_embedding()
+    if not config.EMBEDDING_QUERY_BATCHING:
+        return embedding
+    batcher = get_query_batcher(
+        (config.EMBEDDING_MODEL_PROVIDER, config.EMBEDDING_MODEL_ID, config.EMBEDDING_DEVICE),
+        embedding,
+        config.EMBEDDING_QUERY_MAX_BATCH_SIZE,
+        config.EMBEDDING_QUERY_MAX_WAIT_MS
+    )
+    return BatchedQueryEmbeddings(embedding, batcher)
+
+def get_reranker() -> CrossEncoderReranker:
+    return CrossEncoderReranker(model_id=config.RERANK_MODEL_ID, device=config.RERANK_DEVICE)
+
+def _split_asset_text(asset_id: str):
+    """
+    Splits the extracted text of an asset into CHUNK_SIZE child chunks and PARENT_CHUNK_SIZE parent spans
+    in one pass. Chunks never cross the page/segment blocks of the asset's text index, so editing or
+    appending a page only changes the chunks of its own block.
+    Returns (chunks, parent id of each chunk, parent byte spans).
+    """
+    asset_dir = get_asset_dir(asset_id)
+    with open(os.path.join(asset_dir, TEXT_FILE_NAME), "rb") as f:
+        data = f.read()
+
+    text_index = load_text_index(asset_dir)
+    if text_index is None or text_index["count"] == 0: # assets extracted before the sidecar existed
+        blocks = [(0, len(data))]
+    else:
+        blocks = unit_blocks(text_index, data, config.CHUNK_SIZE, BLOCK_MAX_CHUNKS * config.CHUNK_SIZE)
+
+    texts, chunk_parents, spans = [], [], []
+    for block_start, block_end in blocks:
+        block_texts, block_parents, block_spans = split_with_parents(
+            data[block_start:block_end].decode("utf-8", errors="ignore"),
+            chunk_size=config.CHUNK_SIZE,
+            chunk_overlap=config.CHUNK_OVERLAP,
+            parent_size=config.PARENT_CHUNK_SIZE
+        )
+        texts.extend(block_texts)
+        chunk_parents.extend(len(spans) + parent for parent in block_parents)
+        spans.extend((block_start + s, block_start + e) for s, e in block_spans)
+    return texts, chunk_parents, spans
+
+def chunk_ids(texts: List[str]) -> List[str]:
+    """Content ids of chunks: a hash of the text plus an occurrence number for repeated chunks."""
+    ids, seen = [], {}
+    for text in texts:
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+        seen[digest] = seen.get(digest, -1) + 1
+        ids.append(f"{digest}-{seen[digest]}")
+    return ids
+
+def _index_signature() -> dict:
+    """Settings an index was built with; a change forces a full rebuild instead of an incremental update."""
+    return {
+        "backend": config.RETRIEVER_BACKEND,
+        "provider": config.EMBEDDING_MODEL_PROVIDER,
+        "model_id": config.EMBEDDING_MODEL_ID,
+        "embedding_backend": config.EMBEDDING_BACKEND,
+        "onnx_file_name": config.EMBEDDING_ONNX_FILE_NAME if config.EMBEDDING_BACKEND == "onnx" else None,
+        "flat_index_dtype": config.FLAT_INDEX_DTYPE if config.RETRIEVER_BACKEND == "numpy" else None,
+    }
+
+def _load_manifest(asset_id: str) -> Optional[dict]:
+    path = os.path.join(get_asset_dir(asset_id), CHUNK_MANIFEST_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_manifest(asset_id: str, ids: List[str]):
+    """chunk_manifest.json: the index settings and the content ids of the indexed chunks, in order."""
+    path = os.path.join(get_asset_dir(asset_id), CHUNK_MANIFEST_FILE_NAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"signature": _index_signature(), "ids": ids}, f, separators=(",", ":"))
+    os.replace(f"{path}.tmp", path)
+
+def _write_chunk_sidecars(asset_id: str, texts: List[str], chunk_parents: List[int], spans: list, ids: List[str]):
+    """The BM25 index and parent spans are cheap to rebuild, so they are always rewritten in full."""
+    build_keyword_index(asset_id, texts)
+    if config.PARENT_CHUNK_ENABLED and texts:
+        save_parent_spans(get_asset_dir(asset_id), spans, chunk_parents, ids)
+    else:
+        remove_parent_spans(get_asset_dir(asset_id))
+
+def build_keyword_index(asset_id: str, texts: List[str] = None) -> Optional[str]:
+    """Writes the BM25 inverted index of an asset's chunks to assets/<asset_id>/keyword_index."""
+    texts = _split_asset_text(asset_id)[0] if texts is None else texts
+    keyword_dir = get_keyword_index_dir(asset_id)
+    if os.path.exists(keyword_dir):
+        shutil.rmtree(keyword_dir)
+    if not texts:
+        return None
+    BM25Index.build(texts).save(keyword_dir)
+    return keyword_dir
+
+def build_asset_index(asset_id: str) -> Optional[str]:
+    """
+    Splits the extracted text of an asset and embeds it into a persistent Chroma collection
+    (assets/<asset_id>/vector_index) or, with RETRIEVER_BACKEND="numpy", a flat NumPy index
+    (assets/<asset_id>/flat_index), next to a BM25 keyword index of the same chunks,
+    the asset's topic profile, the chunk manifest and, with PARENT_CHUNK_ENABLED, the parent spans of the chunks.
+    Any previous index is replaced.
+    Returns the index directory, or None when the asset has no text to index.
+    """
+    index_dir = get_index_dir(asset_id)
+    if os.path.exists(index_dir):
+        shutil.rmtree(index_dir)
+
+    texts, chunk_parents, spans = _split_asset_text(asset_id)
+    ids = chunk_ids(texts)
+    _write_chunk_sidecars(asset_id, texts, chunk_parents, spans, ids)
+    if not texts:
+        build_topic_profile(get_asset_dir(asset_id), [])
+        _save_manifest(asset_id, ids)
+        return None
+    metadatas = [{"chunk_id": chunk_id} for chunk_id in ids]
+
+    embedding = _get_embedding()
+    embeddings = embedding.embed_documents(texts)
+    build_topic_profile(get_asset_dir(asset_id), embeddings)
+
+    if config.RETRIEVER_BACKEND == "numpy":
+        _save_flat_index(index_dir, texts, embeddings, metadatas)
+        _save_manifest(asset_id, ids)
+        return index_dir
+
+    vector_store = Chroma(
+        collection_name=COLLECTION_NAME,
+        embedding_function=embedding,
+        persist_directory=index_dir
+    )
+    _add_to_collection(vector_store, ids, texts, embeddings, metadatas)
+    _save_manifest(asset_id, ids)
+    return index_dir
+
+def _add_to_collection(vector_store: Chroma, ids: List[str], texts: List[str], embeddings, metadatas: List[dict]):
+    """Writes chunks with their already computed embeddings, so Chroma does not embed them again."""
+    embeddings = np.asarray(embeddings, dtype=np.float32).tolist()
+    for start in range(0, len(ids), CHROMA_ADD_BATCH_SIZE):
+        end = start + CHROMA_ADD_BATCH_SIZE
+        vector_store._collection.upsert(
+            ids=ids[start:end],
+            embeddings=embeddings[start:end],
+            documents=texts[start:end],
+            metadatas=metadatas[start:end]
+        )
+
+def _save_flat_index(index_dir: str, texts: List[str], embeddings, metadatas: List[dict]):
+    """Saves a numpy-backend index: exact, or IVF for assets of at least IVF_MIN_VECTORS chunks when RETRIEVER_ANN is "ivf"."""
+    save_vector_index(
+        index_dir, texts, embeddings, metadatas,
+        dtype=config.FLAT_INDEX_DTYPE,
+        keep_originals=config.FLAT_INDEX_INT8_KEEP_ORIGINALS,
+        ann=config.RETRIEVER_ANN,
+        min_vectors=config.IVF_MIN_VECTORS,
+        nlist=config.IVF_NLIST
+    )
+
+def update_asset_index(asset_id: str) -> Optional[str]:
+    """
+    Brings the index of an asset in line with its (re-extracted or appended) text: only chunks whose
+    content id is new are embedded and inserted, and chunks that disappeared are deleted.
+    Falls back to build_asset_index for assets without a chunk manifest, or whose index was built
+    with different retriever/embedding settings.
+    Returns the index directory, or None when the asset has no text to index.
+    """
+    index_dir = get_index_dir(asset_id)
+    manifest = _load_manifest(asset_id)
+    if manifest is None or manifest["signature"] != _index_signature() or not os.path.exists(index_dir):
+        return build_asset_index(asset_id)
+
+    texts, chunk_parents, spans = _split_asset_text(asset_id)
+    if not texts:
+        return build_asset_index(asset_id)
+
+    ids = chunk_ids(texts)
+    old_ids = set(manifest["ids"])
+    added = [i for i, chunk_id in enumerate(ids) if chunk_id not in old_ids]
+    removed = old_ids.difference(ids)
+    _write_chunk_sidecars(asset_id, texts, chunk_parents, spans, ids)
+
+    embedding = _get_embedding()
+    added_embeddings = embedding.embed_documents([texts[i] for i in added]) if added else []
+    metadatas = [{"chunk_id": chunk_id} for chunk_id in ids]
+
+    if config.RETRIEVER_BACKEND == "numpy":
+        old_index = load_vector_index(index_dir)
+        old_rows = {metadata.get("chunk_id"): row for row, metadata in enumerate(old_index.metadatas)}
+        embeddings = np.empty((len(ids), old_index.embeddings.shape[1]), dtype=np.float32)
+        kept = [i for i, chunk_id in enumerate(ids) if chunk_id in old_ids]
+        if kept: # kept int8 originals are reused as they are; otherwise dequantized vectors re-quantize to the same codes
+            embeddings[kept] = old_index.vectors(np.asarray([old_rows[ids[i]] for i in kept]))
+        if added:
+            embeddings[added] = np.asarray(added_embeddings, dtype=np.float32)
+
+        staging_dir = f"{index_dir}.staging" # open retrievers keep reading the old memory-mapped files
+        if os.path.exists(staging_dir):
+            shutil.rmtree(staging_dir)
+        _save_flat_index(staging_dir, texts, embeddings, metadatas)
+        retired_dir = f"{index_dir}.old" # moved aside rather than deleted, so index_dir is never missing
+        if os.path.exists(retired_dir):
+            shutil.rmtree(retired_dir)
+        os.replace(index_dir, retired_dir)
+        os.replace(staging_dir, index_dir)
+        shutil.rmtree(retired_dir)
+    else:
+        vector_store = Chroma(
+            collection_name=COLLECTION_NAME,
+            embedding_function=embedding,
+            persist_directory=index_dir
+        )
+        if removed:
+            vector_store.delete(ids=list(removed))
+        if added:
+            _add_to_collection(
+                vector_store, [ids[i] for i in added], [texts[i] for i in added], added_embeddings, [metadatas[i] for i in added]
+            )
+        stored = vector_store.get(include=["embeddings"])
+        stored_vectors = dict(zip(stored["ids"], stored["embeddings"]))
+        embeddings = np.asarray([stored_vectors[chunk_id] for chunk_id in ids], dtype=np.float32)
+
+    build_topic_profile(get_asset_dir(asset_id), embeddings)
+    _save_manifest(asset_id, ids)
+    print(f"Reindexed asset {asset_id}: {len(added)} chunks added, {len(removed)} removed, {len(ids) - len(added)} unchanged")
+    return index_dir
+
+def _load_dense_retriever(index_dir: str, k: int, search_type: str = "mmr") -> BaseRetriever:
+    if config.RETRIEVER_BACKEND == "numpy":
+        return FlatIndexRetriever(
+            index=load_vector_index(index_dir, config.FLAT_INDEX_RESCORE_FACTOR, config.IVF_NPROBE),
+            embedding=get_query_embedding(),
+            search_type=search_type,
+            k=k
+        )
+
+    vector_store = Chroma(
+        collection_name=COLLECTION_NAME,
+        embedding_function=get_query_embedding(),
+        persist_directory=index_dir
+    )
+    return vector_store.as_retriever(search_type=search_type, search_kwargs={"k": k})
+
+def _load_first_stage_retriever(asset_id: str, index_dir: str, k: int, search_type: str) -> BaseRetriever:
+    if not config.RETRIEVER_HYBRID:
+        return _load_dense_retriever(index_dir, k, search_type)
+
+    keyword_dir = get_keyword_index_dir(asset_id)
+    if not os.path.exists(keyword_dir) and build_keyword_index(asset_id) is None:
+        return _load_dense_retriever(index_dir, k, search_type)
+
+    candidates = max(config.HYBRID_CANDIDATES, k)
+    return HybridRetriever(
+        retrievers=[
+            _load_dense_retriever(index_dir, candidates, search_type),
+            BM25Retriever(index=BM25Index.load(keyword_dir), k=candidates)
+        ],
+        k=k,
+        rrf_k=config.HYBRID_RRF_K
+    )
+
+def _index_version(asset_id: str, index_dir: str):
+    """Changes whenever the asset is (re)indexed, so cached shards of an updated asset are reloaded."""
+    manifest_path = os.path.join(get_asset_dir(asset_id), CHUNK_MANIFEST_FILE_NAME)
+    path = manifest_path if os.path.exists(manifest_path) else index_dir
+    return (config.RETRIEVER_BACKEND, os.stat(path).st_mtime_ns)
+
+def get_asset_shard(asset_id: str, k: int, search_type: str) -> Optional[BaseRetriever]:
+    """
+    The first-stage retriever of an asset from the shard LRU (RETRIEVER_SHARD_CACHE_SIZE loaded assets).
+    Assets uploaded before indexing existed are indexed lazily on first use, but never while an
+    ingestion job is writing the asset's text or index: the asset has no shard until the job is done.
+    """
+    index_dir = get_index_dir(asset_id)
+    if not os.path.exists(index_dir) and (is_ingesting(asset_id) or build_asset_index(asset_id) is None):
+        return None
+    return shard_cache.get(
+        (asset_id, k, search_type),
+        _index_version(asset_id, index_dir),
+        lambda: _load_first_stage_retriever(asset_id, index_dir, k, search_type)
+    )
+
+def load_asset_retriever(asset_id: str, k: int = 5) -> Optional[BaseRetriever]:
+    """
+    Opens the persisted index of an asset as an MMR retriever. With RETRIEVER_HYBRID the dense
+    results are fused with BM25 keyword results by reciprocal rank fusion.
+    With RERANK_ENABLED, RERANK_CANDIDATES plain similarity results are rescored by the
+    cross-encoder and the best k are returned.
+    """
+    return load_course_retriever([asset_id], k)
+
+def load_course_retriever(asset_ids: List[str], k: int = 5) -> Optional[BaseRetriever]:
+    """
+    Retriever over the assets of a course. Each asset is a shard searched concurrently; the shard
+    results are fused by rank into a global top k (see ShardedRetriever). With RERANK_ENABLED the
+    cross-encoder reranks the merged candidates once, so its scores compare across assets.
+    A single asset is searched directly.
+    """
+    rerank = config.RERANK_ENABLED
+    shard_k = max(config.RERANK_CANDIDATES, k) if rerank else k
+    search_type = "similarity" if rerank else "mmr" # the cross-encoder orders the candidates, so the cheaper search suffices
+
+    if len(asset_ids) == 1:
+        retriever = get_asset_shard(asset_ids[0], shard_k, search_type)
+        if retriever is None:
+            return None
+    else:
+        retriever = ShardedRetriever(
+            asset_ids=list(asset_ids),
+            load_shard=lambda asset_id: get_asset_shard(asset_id, shard_k, search_type),
+            executor=get_shard_executor(config.RETRIEVER_SHARD_WORKERS),
+            k=shard_k,
+            rrf_k=config.HYBRID_RRF_K
+        )
+
+    if not rerank:
+        return retriever
+    return RerankRetriever(retriever=retriever, reranker=get_reranker(), k=k)